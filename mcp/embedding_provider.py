@@ -0,0 +1,249 @@
+"""
+Embedding Providers for SoulCoreHub
+Implements pluggable, batched and cached text embedding
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EmbeddingProvider:
+    """Base class for text embedding providers"""
+
+    def __init__(self, dimension: int, name: str):
+        """
+        Initialize the provider
+
+        Args:
+            dimension: Dimension of the produced vectors
+            name: Stable identifier, used to key caches
+        """
+        self.dimension = dimension
+        self.name = name
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a single text
+
+        Args:
+            text: The text to embed
+
+        Returns:
+            The embedding vector
+        """
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed a batch of texts in one request
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            One embedding vector per text, in order
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def close(self):
+        """Release any resources held by the provider"""
+        pass
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic local embedder based on the hashing trick
+
+    Words and character n-grams are hashed with BLAKE2b into signed
+    buckets, so the same text always yields the same vector in every
+    process, and texts sharing vocabulary land close together.
+    """
+
+    def __init__(self, dimension: int = 768, ngram_range: Tuple[int, int] = (3, 5),
+                word_weight: float = 1.0, ngram_weight: float = 0.5):
+        """
+        Initialize the embedder
+
+        Args:
+            dimension: Dimension of the produced vectors
+            ngram_range: Smallest and largest character n-gram lengths
+            word_weight: Weight of whole-word features
+            ngram_weight: Weight of character n-gram features
+        """
+        super().__init__(dimension, f"hashing-v1-{dimension}-{ngram_range[0]}-{ngram_range[1]}")
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+        self.ngram_weight = ngram_weight
+
+    def _features(self, text: str) -> Dict[str, float]:
+        """Extract weighted word and character n-gram features"""
+        features: Dict[str, float] = {}
+        low, high = self.ngram_range
+        for word in re.findall(r"\w+", text.lower()):
+            key = "w:" + word
+            features[key] = features.get(key, 0.0) + self.word_weight
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                for start in range(0, max(1, len(padded) - n + 1)):
+                    key = "c:" + padded[start:start + n]
+                    features[key] = features.get(key, 0.0) + self.ngram_weight
+        return features
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts synchronously
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            Matrix of unit-length float32 rows, one per text
+        """
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            buckets = np.empty(len(features), dtype=np.int64)
+            values = np.empty(len(features), dtype=np.float32)
+            for i, (feature, weight) in enumerate(features.items()):
+                digest = int.from_bytes(
+                    hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"
+                )
+                buckets[i] = digest % self.dimension
+                # Use an independent hash bit as the sign to reduce collision bias
+                values[i] = weight if (digest >> 63) & 1 else -weight
+            np.add.at(vectors[row], buckets, values)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    async def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        # Hashing is CPU-bound, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return list(await loop.run_in_executor(None, self.encode, texts))
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """
+    Wraps a provider with an in-memory LRU and an optional on-disk cache
+
+    Entries are keyed by a hash of the provider name and the text, so
+    repeated content is embedded once and misses within a batch are sent
+    to the wrapped provider as a single embed_many call.
+    """
+
+    def __init__(self, provider: EmbeddingProvider, max_entries: int = 10000,
+                cache_path: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            provider: The provider to wrap
+            max_entries: Maximum number of vectors held in memory
+            cache_path: SQLite file for the persistent cache (None to disable)
+        """
+        super().__init__(provider.dimension, provider.name)
+        self.provider = provider
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        if cache_path:
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._disk = sqlite3.connect(cache_path, check_same_thread=False)
+            self._disk.execute('PRAGMA journal_mode=WAL')
+            self._disk.execute('''
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL
+            )
+            ''')
+            self._disk.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._disk_lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self._disk.execute(
+                    f'SELECT key, embedding FROM embedding_cache WHERE key IN ({placeholders})',
+                    chunk
+                )
+                for key, blob in cursor.fetchall():
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _disk_store(self, entries: List[Tuple[str, np.ndarray]]):
+        with self._disk_lock:
+            self._disk.executemany(
+                'INSERT OR REPLACE INTO embedding_cache (key, embedding) VALUES (?, ?)',
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in entries]
+            )
+            self._disk.commit()
+
+    async def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        keys = [self._key(text) for text in texts]
+        results: Dict[str, np.ndarray] = {}
+
+        for key in keys:
+            if key in self._memory and key not in results:
+                self._memory.move_to_end(key)
+                results[key] = self._memory[key]
+
+        missing = list(dict.fromkeys(key for key in keys if key not in results))
+        if missing and self._disk is not None:
+            loop = asyncio.get_running_loop()
+            found = await loop.run_in_executor(None, self._disk_lookup, missing)
+            for key, vector in found.items():
+                self._remember(key, vector)
+                results[key] = vector
+            missing = [key for key in missing if key not in results]
+
+        self.hits += sum(1 for key in keys if key not in missing)
+
+        if missing:
+            # Embed each distinct missing text once, in a single batch
+            texts_by_key = dict(zip(keys, texts))
+            vectors = await self.provider.embed_many([texts_by_key[key] for key in missing])
+            self.misses += len(missing)
+            for key, vector in zip(missing, vectors):
+                self._remember(key, vector)
+                results[key] = vector
+            if self._disk is not None:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._disk_store, list(zip(missing, vectors)))
+
+        return [results[key] for key in keys]
+
+    def close(self):
+        self.provider.close()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.close()
+            self._disk = None
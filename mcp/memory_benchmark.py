@@ -0,0 +1,262 @@
+"""
+Memory System Benchmark for SoulCoreHub
+Measures MemorySystem throughput, latency and memory use on synthetic stores
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+from mcp.memory_system import MemorySystem, QueryCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ["store", "store_many", "search", "search_cached", "search_by_tag", "get_stats", "forget"]
+
+WORDS = (
+    "memory agent model vector index query cache signal pattern network story code "
+    "summary idea dream insight context token stream router update event system user "
+    "task plan goal value result error history future light shadow energy"
+).split()
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process, in megabytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize(latencies: List[float], items: int = None) -> Dict[str, Any]:
+    """
+    Summarize operation latencies
+
+    Args:
+        latencies: Seconds taken by each call
+        items: Items processed in total, when calls handle more than one
+
+    Returns:
+        Call count, throughput and p50/p95/p99 latency in milliseconds
+    """
+    total = float(sum(latencies))
+    items = len(latencies) if items is None else items
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return {
+        "calls": len(latencies),
+        "items": items,
+        "total_seconds": round(total, 6),
+        "throughput_per_second": round(items / total, 2) if total else None,
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4)
+    }
+
+async def timed(calls: List[Callable[[], Awaitable[Any]]]) -> List[float]:
+    """Run calls one after another, returning the latency of each"""
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+class SyntheticMemories:
+    """Deterministic generator of memory contents, tags and clustered embeddings"""
+
+    def __init__(self, dimension: int, seed: int = 0, tags: int = 100, clusters: int = 64):
+        self.dimension = dimension
+        self.tags = tags
+        self.rng = np.random.default_rng(seed)
+        self.centers = self.rng.standard_normal((clusters, dimension)).astype(np.float32)
+
+    def text(self) -> str:
+        return " ".join(self.rng.choice(WORDS, size=int(self.rng.integers(8, 20))))
+
+    def items(self, count: int, embed: bool) -> List[Dict[str, Any]]:
+        """Build `count` store_many items; embeddings are left to the system when embed is set"""
+        if not embed:
+            labels = self.rng.integers(0, len(self.centers), size=count)
+            noise = self.rng.standard_normal((count, self.dimension)).astype(np.float32)
+            vectors = self.centers[labels] + 0.5 * noise
+        items = []
+        for i in range(count):
+            item = {
+                "content": self.text(),
+                "metadata": {"tags": [f"tag-{tag}" for tag in
+                                      self.rng.choice(self.tags, size=2, replace=False)]},
+                "importance": float(self.rng.random())
+            }
+            if not embed:
+                item["embedding"] = vectors[i]
+            items.append(item)
+        return items
+
+async def run_size(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Build a store of `size` memories and benchmark every operation on it"""
+    workdir = tempfile.mkdtemp(prefix=f"memory-bench-{size}-", dir=args.workdir)
+    synthetic = SyntheticMemories(args.dimension, seed=args.seed)
+    operations: Dict[str, Dict[str, Any]] = {}
+
+    try:
+        memory = MemorySystem(
+            os.path.join(workdir, "memory.db"),
+            vector_dimension=args.dimension,
+            index=None if args.index == "none" else args.index,
+            embedding_storage=args.storage,
+            # Measure real searches; the cache is measured separately below
+            query_cache_size=0
+        )
+        async with memory:
+            # Bulk load, timed per store_many call
+            load_latencies = []
+            loaded = 0
+            while loaded < size:
+                batch = synthetic.items(min(args.batch_size, size - loaded), args.embed)
+                start = time.perf_counter()
+                await memory.store_many(batch, batch_size=args.batch_size, return_memories=False)
+                load_latencies.append(time.perf_counter() - start)
+                loaded += len(batch)
+            operations["store_many"] = summarize(load_latencies, items=loaded)
+            logger.info(f"Loaded {loaded} memories")
+
+            samples = args.samples
+            items = synthetic.items(samples, args.embed)
+            stored: List[str] = []
+
+            async def store(item):
+                stored.append((await memory.store(item["content"], item["metadata"],
+                                                  item.get("embedding"), item["importance"])).memory_id)
+
+            operations["store"] = summarize(await timed([lambda item=item: store(item) for item in items]))
+
+            queries = [synthetic.text() for _ in range(samples)]
+            operations["search"] = summarize(await timed(
+                [lambda query=query: memory.search(query, limit=args.limit) for query in queries]
+            ))
+
+            # Same query repeatedly, against a system with its query cache enabled
+            memory.query_cache = QueryCache()
+            operations["search_cached"] = summarize(await timed(
+                [lambda: memory.search(queries[0], limit=args.limit) for _ in range(samples)]
+            ))
+            memory.query_cache = None
+
+            tags = [f"tag-{tag}" for tag in synthetic.rng.integers(0, synthetic.tags, size=samples)]
+            operations["search_by_tag"] = summarize(await timed(
+                [lambda tag=tag: memory.search_by_tag(tag, limit=args.limit) for tag in tags]
+            ))
+
+            operations["get_stats"] = summarize(await timed(
+                [memory.get_stats for _ in range(max(1, samples // 10))]
+            ))
+
+            operations["forget"] = summarize(await timed(
+                [lambda memory_id=memory_id: memory.forget(memory_id) for memory_id in stored]
+            ))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "size": size,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "operations": {name: operations[name] for name in OPERATIONS if name in operations}
+    }
+
+def run_isolated(size: int, argv: List[str]) -> Dict[str, Any]:
+    """Benchmark one size in a child process, so peak RSS is measured per size"""
+    command = [sys.executable, "-m", "mcp.memory_benchmark", *argv,
+               "--sizes", str(size), "--in-process", "--output", "-"]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+    return json.loads(completed.stdout)["results"][0]
+
+def strip_sizes(argv: List[str]) -> List[str]:
+    """Remove --sizes and --output from an argument list"""
+    stripped, skipping = [], False
+    for arg in argv:
+        if arg in ("--sizes", "--output"):
+            skipping = True
+            continue
+        if skipping and not arg.startswith("--"):
+            continue
+        skipping = False
+        stripped.append(arg)
+    return stripped
+
+def main():
+    """Run the benchmark and write the results as JSON"""
+    parser = argparse.ArgumentParser(description="SoulCore memory system benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Store sizes to benchmark")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--samples", type=int, default=1000,
+                        help="Calls timed per operation")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Items per store_many call")
+    parser.add_argument("--limit", type=int, default=5, help="Results per search")
+    parser.add_argument("--index", default="ivf", choices=["ivf", "flat", "none"],
+                        help="Vector index used by the memory system")
+    parser.add_argument("--storage", default="blob", choices=["blob", "sidecar"],
+                        help="Embedding storage")
+    parser.add_argument("--embed", action="store_true",
+                        help="Embed contents with the system's provider instead of "
+                             "using precomputed synthetic vectors")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for synthetic data")
+    parser.add_argument("--workdir", default=None, help="Directory for the temporary databases")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark databases")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run every size in this process (peak RSS then accumulates)")
+    parser.add_argument("--output", default="-", help="JSON output file, or - for stdout")
+    args = parser.parse_args()
+
+    if args.in_process:
+        async def run():
+            return [await run_size(size, args) for size in args.sizes]
+        results = asyncio.run(run())
+    else:
+        argv = strip_sizes(sys.argv[1:])
+        results = [run_isolated(size, argv) for size in args.sizes]
+
+    report = {
+        "benchmark": "memory_system",
+        "timestamp": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "config": {
+            "dimension": args.dimension,
+            "samples": args.samples,
+            "batch_size": args.batch_size,
+            "limit": args.limit,
+            "index": args.index,
+            "storage": args.storage,
+            "embed": args.embed,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        logger.info(f"Wrote benchmark results to {args.output}")
+
+if __name__ == "__main__":
+    main()
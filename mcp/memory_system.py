@@ -3,20 +3,269 @@ Memory System for SoulCoreHub
 Implements long-term memory with ranking and retrieval capabilities
 """
 
+import argparse
+import asyncio
+import hashlib
 import json
+import math
 import os
+import queue
+import re
+import struct
+import sys
 import time
 import logging
 import sqlite3
+import threading
 import numpy as np
-from typing import Dict, List, Any, Optional, Tuple, Union
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import AsyncIterable, Callable, Dict, Iterable, List, Any, Optional, Tuple, Union
+from datetime import datetime, timedelta
 from pathlib import Path
 
+from mcp.embedding_provider import CachedEmbeddingProvider, EmbeddingProvider, HashingEmbeddingProvider
+from mcp.vector_index import FlatIndex, IVFFlatIndex, MmapFlatIndex, VectorIndex, create_index
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Embedding BLOB layout: magic, dtype code, reserved bytes, dimension,
+# then (for int8 only) a float32 scale, then the vector payload.
+# BLOBs without the magic are legacy raw float64 arrays.
+EMBEDDING_MAGIC = b"SCEV"
+EMBEDDING_HEADER = struct.Struct("<4sBxxxI")
+EMBEDDING_DTYPES = {"float64": 1, "float32": 2, "float16": 3, "int8": 4}
+_EMBEDDING_CODES = {code: name for name, code in EMBEDDING_DTYPES.items()}
+_EMBEDDING_SCALE = struct.Struct("<f")
+
+def encode_embedding(embedding: np.ndarray, dtype: str = "float32") -> bytes:
+    """
+    Encode an embedding as a self-describing BLOB
+    
+    Args:
+        embedding: The embedding vector
+        dtype: Storage type ("float64", "float32", "float16" or "int8")
+        
+    Returns:
+        The encoded bytes
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {dtype}")
+    
+    embedding = np.asarray(embedding).ravel()
+    header = EMBEDDING_HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_DTYPES[dtype], embedding.shape[0])
+    
+    if dtype == "int8":
+        # Symmetric scalar quantization with one scale per row
+        peak = float(np.max(np.abs(embedding))) if embedding.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        quantized = np.clip(np.rint(embedding / scale), -127, 127).astype(np.int8)
+        return header + _EMBEDDING_SCALE.pack(scale) + quantized.tobytes()
+    
+    return header + embedding.astype(dtype).tobytes()
+
+def embedding_blob_dtype(blob: bytes) -> str:
+    """Return the storage type of an embedding BLOB"""
+    if len(blob) >= EMBEDDING_HEADER.size and blob[:4] == EMBEDDING_MAGIC:
+        _, code, dimension = EMBEDDING_HEADER.unpack_from(blob)
+        dtype = _EMBEDDING_CODES.get(code)
+        if dtype is not None and len(blob) == _encoded_size(dtype, dimension):
+            return dtype
+    return "legacy"
+
+def _encoded_size(dtype: str, dimension: int) -> int:
+    extra = _EMBEDDING_SCALE.size if dtype == "int8" else 0
+    return EMBEDDING_HEADER.size + extra + dimension * np.dtype(dtype).itemsize
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    """
+    Decode an embedding BLOB written by encode_embedding (or a legacy raw float64 BLOB)
+    
+    Args:
+        blob: The stored bytes
+        
+    Returns:
+        The embedding (float64 for float64 storage, float32 otherwise)
+    """
+    dtype = embedding_blob_dtype(blob)
+    if dtype == "legacy":
+        return np.frombuffer(blob, dtype=np.float64)
+    
+    offset = EMBEDDING_HEADER.size
+    if dtype == "int8":
+        scale = _EMBEDDING_SCALE.unpack_from(blob, offset)[0]
+        quantized = np.frombuffer(blob, dtype=np.int8, offset=offset + _EMBEDDING_SCALE.size)
+        return quantized.astype(np.float32) * np.float32(scale)
+    
+    embedding = np.frombuffer(blob, dtype=dtype, offset=offset)
+    return embedding.astype(np.float32) if dtype == "float16" else embedding
+
+class EmbeddingSidecar:
+    """
+    Append-only, memory-mapped file of fixed-size embedding rows
+    
+    The file starts with a 64-byte header (magic, dtype code, dimension)
+    followed by one contiguous row per embedding, so the whole file can be
+    mapped as a (rows, dimension) matrix without copying.
+    """
+    
+    MAGIC = b"SCVEC001"
+    HEADER = struct.Struct("<8sBxxxI")
+    HEADER_SIZE = 64
+    
+    def __init__(self, path: str, dimension: int, dtype: str = "float32"):
+        """
+        Open or create a sidecar file
+        
+        Args:
+            path: Path to the sidecar file
+            dimension: Embedding dimension
+            dtype: Row storage type for a new file ("float64", "float32" or "float16")
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        
+        if os.path.exists(path) and os.path.getsize(path) >= self.HEADER_SIZE:
+            with open(path, "rb") as f:
+                magic, code, stored_dimension = self.HEADER.unpack(f.read(self.HEADER.size))
+            if magic != self.MAGIC or code not in _EMBEDDING_CODES:
+                raise ValueError(f"Not an embedding sidecar file: {path}")
+            if stored_dimension != dimension:
+                raise ValueError(f"Sidecar {path} holds {stored_dimension}-dimensional "
+                                 f"embeddings, expected {dimension}")
+            self.dtype = np.dtype(_EMBEDDING_CODES[code])
+            self.dimension = stored_dimension
+        else:
+            if dtype not in ("float64", "float32", "float16"):
+                raise ValueError(f"Unsupported sidecar dtype: {dtype}")
+            self.dtype = np.dtype(dtype)
+            self.dimension = dimension
+            self._write_header(path)
+        
+        self._row_bytes = self.dimension * self.dtype.itemsize
+        self._rows = (os.path.getsize(path) - self.HEADER_SIZE) // self._row_bytes
+    
+    def _write_header(self, path: str):
+        header = self.HEADER.pack(self.MAGIC, EMBEDDING_DTYPES[self.dtype.name], self.dimension)
+        with open(path, "wb") as f:
+            f.write(header.ljust(self.HEADER_SIZE, b"\0"))
+    
+    def __len__(self) -> int:
+        return self._rows
+    
+    @property
+    def matrix(self) -> np.ndarray:
+        """A read-only (rows, dimension) view of the file"""
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[0] != self._rows:
+                if self._rows:
+                    self._matrix = np.memmap(self.path, dtype=self.dtype, mode="r",
+                                             offset=self.HEADER_SIZE,
+                                             shape=(self._rows, self.dimension))
+                else:
+                    self._matrix = np.empty((0, self.dimension), dtype=self.dtype)
+            return self._matrix
+    
+    def append(self, vectors: np.ndarray) -> List[int]:
+        """
+        Append embeddings to the file
+        
+        Args:
+            vectors: Matrix of shape (n, dimension)
+            
+        Returns:
+            Row offsets of the appended embeddings
+        """
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype=self.dtype)
+        with self._lock:
+            start = self._rows
+            with open(self.path, "ab") as f:
+                f.write(vectors.tobytes())
+            self._rows += len(vectors)
+        return list(range(start, start + len(vectors)))
+    
+    def read(self, offset: int) -> np.ndarray:
+        """Copy one embedding out of the file"""
+        return np.array(self.matrix[offset], dtype=np.float32 if self.dtype == np.float16 else self.dtype)
+    
+    def write_compacted(self, path: str, offsets: List[int], chunk_size: int = 65536):
+        """Write the given rows, in order, to a new sidecar file"""
+        self._write_header(path)
+        matrix = self.matrix
+        with open(path, "ab") as f:
+            for start in range(0, len(offsets), chunk_size):
+                rows = np.asarray(offsets[start:start + chunk_size], dtype=np.int64)
+                f.write(np.ascontiguousarray(matrix[rows]).tobytes())
+    
+    def reload(self):
+        """Re-read the file after it has been replaced on disk"""
+        with self._lock:
+            self._matrix = None
+            self._rows = (os.path.getsize(self.path) - self.HEADER_SIZE) // self._row_bytes
+
+# Crockford base32, and every two-digit string of it for 10-bit lookups
+ULID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ULID_PAIRS = [a + b for a in ULID_ALPHABET for b in ULID_ALPHABET]
+
+class UlidGenerator:
+    """
+    Generates ULIDs: sortable, collision-free 26-character identifiers
+    
+    Each ID is a 48-bit millisecond timestamp followed by 80 random bits,
+    in Crockford base32. Within one millisecond the random part is
+    incremented instead of redrawn, so IDs from one generator are strictly
+    increasing and inserts land at the right edge of the primary key B-tree.
+    """
+    
+    _RANDOM_LIMIT = 1 << 80
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._random = 0
+    
+    def __call__(self) -> str:
+        """Return the next ID"""
+        with self._lock:
+            now = time.time_ns() // 1_000_000
+            if now > self._last_ms:
+                self._last_ms = now
+                self._random = int.from_bytes(os.urandom(10), "big")
+            else:
+                # Same millisecond, or the clock stepped back: keep counting
+                self._random += 1
+                if self._random >= self._RANDOM_LIMIT:
+                    self._last_ms += 1
+                    self._random = 0
+            value = (self._last_ms << 80) | self._random
+        
+        pairs = _ULID_PAIRS
+        # 130 bits of base32 hold the 128-bit value; the leading digit is 0-7
+        return "".join(pairs[(value >> shift) & 0x3FF] for shift in range(120, -10, -10))
+
+new_memory_id = UlidGenerator()
+
+# Export directories hold a manifest.json plus one .npz file per chunk of rows
+EXPORT_FORMAT = "soulcore-memory-export"
+EXPORT_VERSION = 1
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Store strings as one UTF-8 byte buffer plus row offsets"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """Inverse of _pack_strings"""
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return [raw[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
 class MemoryEncoder(json.JSONEncoder):
     """Custom JSON encoder for memory objects"""
     def default(self, obj):
@@ -29,6 +278,12 @@ class MemoryEncoder(json.JSONEncoder):
 class Memory:
     """A single memory entry"""
     
+    # Slots keep large result sets compact: no per-instance __dict__
+    __slots__ = (
+        "memory_id", "content", "metadata", "embedding",
+        "created_at", "last_accessed", "access_count", "importance"
+    )
+    
     def __init__(self, content: str, metadata: Dict[str, Any] = None, 
                 embedding: np.ndarray = None, memory_id: str = None):
         """
@@ -40,7 +295,7 @@ class Memory:
             embedding: Vector embedding of the memory content
             memory_id: Unique identifier for the memory
         """
-        self.memory_id = memory_id or str(int(time.time() * 1000))
+        self.memory_id = memory_id or new_memory_id()
         self.content = content
         self.metadata = metadata or {}
         self.embedding = embedding
@@ -84,32 +339,470 @@ class Memory:
         memory.importance = data["importance"]
         return memory
 
+def _lazy_field(name: str, decode: Callable[[Any], Any]) -> property:
+    """Property that decodes a LazyMemory field from its raw value on first access"""
+    slot = getattr(Memory, name)
+    
+    def get(self):
+        pending = self._pending
+        if pending is not None and name in pending:
+            raw = pending.pop(name)
+            # Once every field is decoded the raw values are released
+            if not pending:
+                self._pending = None
+            slot.__set__(self, decode(raw))
+        return slot.__get__(self, type(self))
+    
+    def set(self, value):
+        pending = self._pending
+        if pending is not None:
+            pending.pop(name, None)
+            if not pending:
+                self._pending = None
+        slot.__set__(self, value)
+    
+    return property(get, set)
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+class LazyMemory(Memory):
+    """
+    A memory loaded from a database row that decodes on demand
+    
+    Metadata JSON, the embedding BLOB and the timestamps are kept raw
+    until first read, so ranking on importance or returning content
+    never pays for parsing fields the caller does not look at.
+    """
+    
+    __slots__ = ("_pending",)
+    
+    def __init__(self, memory_id: str, content: str, access_count: int, importance: float,
+                metadata: str, embedding: Optional[bytes], created_at: str, last_accessed: str):
+        """
+        Initialize a memory from raw column values
+        
+        Args:
+            memory_id: Unique identifier for the memory
+            content: The content of the memory
+            access_count: Number of recorded accesses
+            importance: Importance score (0-1)
+            metadata: Metadata as a JSON string
+            embedding: Encoded embedding BLOB, or None
+            created_at: Creation time as an ISO string
+            last_accessed: Last access time as an ISO string
+        """
+        self.memory_id = memory_id
+        self.content = content
+        self.access_count = access_count
+        self.importance = importance
+        self._pending = {
+            "metadata": metadata,
+            "embedding": embedding,
+            "created_at": created_at,
+            "last_accessed": last_accessed
+        }
+    
+    metadata = _lazy_field("metadata", json.loads)
+    embedding = _lazy_field("embedding", lambda blob: decode_embedding(blob) if blob else None)
+    created_at = _lazy_field("created_at", _parse_timestamp)
+    last_accessed = _lazy_field("last_accessed", _parse_timestamp)
+
+class QueryCache:
+    """
+    Bounded LRU cache of search results with a time-to-live
+    
+    Entries are tagged with the generation they were computed at. Any
+    write that can change search results bumps the generation, which
+    invalidates every entry at once without walking the cache.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 300.0):
+        """
+        Initialize the cache
+        
+        Args:
+            max_entries: Maximum number of cached result lists
+            ttl: Seconds a result stays valid (None for no expiry)
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[int, float, List[Memory]]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def make_key(embedding: np.ndarray, *parts: Any) -> str:
+        """Hash a query embedding together with the other search arguments"""
+        digest = hashlib.blake2b(np.ascontiguousarray(embedding).tobytes(), digest_size=16)
+        digest.update(json.dumps(parts, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def invalidate(self):
+        """Drop every cached result by starting a new generation"""
+        self.generation += 1
+    
+    def get(self, key: str) -> Optional[List[Memory]]:
+        """Return the cached results for a key, or None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            generation, expires, results = entry
+            if generation == self.generation and expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(results)
+            del self._entries[key]
+        self.misses += 1
+        return None
+    
+    def put(self, key: str, results: List[Memory], generation: int):
+        """
+        Cache results computed at `generation`
+        
+        Results from a generation that has since been invalidated are
+        dropped, so a search racing a write never caches stale data.
+        """
+        if generation != self.generation:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else math.inf
+        self._entries[key] = (generation, expires, list(results))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class ConnectionManager:
+    """
+    Long-lived SQLite connections for a memory database
+    
+    Holds one writer connection and a small pool of reader connections,
+    all in WAL mode so readers never block the writer. Blocking database
+    work is run on a thread pool so async callers keep the event loop free.
+    """
+    
+    def __init__(self, db_path: str, readers: int = 4):
+        """
+        Initialize the connection manager
+        
+        Args:
+            db_path: Path to the SQLite database
+            readers: Number of pooled reader connections
+        """
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        # Only takes effect on new databases (existing ones switch on VACUUM);
+        # must precede the WAL switch, which writes the database header
+        self._writer.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self._writer.execute('PRAGMA journal_mode=WAL')
+        
+        self._readers: queue.Queue = queue.Queue()
+        for _ in range(max(1, readers)):
+            self._readers.put(self._connect())
+        
+        self.executor = ThreadPoolExecutor(max_workers=max(1, readers) + 1,
+                                           thread_name_prefix="memory-db")
+        self._closed = False
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection configured for shared use across threads"""
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+    
+    @contextmanager
+    def reader(self):
+        """Borrow a reader connection from the pool"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block on the writer connection inside one transaction"""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+    
+    def _run_read(self, func: Callable, args: tuple):
+        with self.reader() as conn:
+            return func(conn, *args)
+    
+    def _run_write(self, func: Callable, args: tuple):
+        with self.transaction() as conn:
+            return func(conn, *args)
+    
+    async def read(self, func: Callable, *args):
+        """Run func(conn, *args) with a reader connection on the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._run_read, func, args)
+    
+    async def write(self, func: Callable, *args):
+        """Run func(conn, *args) in a write transaction on the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._run_write, func, args)
+    
+    def _run_exclusive(self, func: Callable, args: tuple):
+        with self._write_lock:
+            self._writer.commit()
+            return func(self._writer, *args)
+    
+    async def run_exclusive(self, func: Callable, *args):
+        """
+        Run func(conn, *args) on the writer outside any transaction
+        
+        Used for statements that cannot run inside a transaction, such as
+        VACUUM and some PRAGMAs.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._run_exclusive, func, args)
+    
+    def close(self):
+        """Shut down the thread pool and close every connection"""
+        if self._closed:
+            return
+        self._closed = True
+        self.executor.shutdown(wait=True)
+        with self._write_lock:
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+class AccessStatsBuffer:
+    """
+    Collects access-statistics updates and writes them in batches
+    
+    Accesses are merged in memory per memory ID and flushed with a single
+    executemany inside one transaction, either once max_pending memories
+    are waiting or flush_interval seconds after the first pending access.
+    """
+    
+    def __init__(self, db: ConnectionManager, max_pending: int = 256, 
+                flush_interval: float = 5.0):
+        """
+        Initialize the buffer
+        
+        Args:
+            db: Connection manager used to write the updates
+            max_pending: Number of distinct memories that triggers a flush
+            flush_interval: Seconds before pending updates are flushed
+        """
+        self.db = db
+        self.max_pending = max(1, max_pending)
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, List[Any]] = {}
+        self._timer: Optional[asyncio.Task] = None
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    async def record(self, memory_ids: List[str]):
+        """
+        Record one access to each of the given memories
+        
+        Args:
+            memory_ids: IDs of the accessed memories
+        """
+        now = datetime.now().isoformat()
+        for memory_id in memory_ids:
+            entry = self._pending.get(memory_id)
+            if entry is None:
+                self._pending[memory_id] = [now, 1]
+            else:
+                entry[0] = now
+                entry[1] += 1
+        
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        elif self._pending and (self._timer is None or self._timer.done()):
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+    
+    async def flush(self) -> int:
+        """
+        Write all pending updates in one transaction
+        
+        Returns:
+            Number of memories updated
+        """
+        if not self._pending:
+            return 0
+        
+        pending, self._pending = self._pending, {}
+        rows = [(last_accessed, count, memory_id) 
+                for memory_id, (last_accessed, count) in pending.items()]
+        try:
+            await self.db.write(self._apply, rows)
+        except Exception:
+            # Keep the updates so the next flush can retry them
+            for memory_id, (last_accessed, count) in pending.items():
+                entry = self._pending.setdefault(memory_id, [last_accessed, 0])
+                entry[1] += count
+            raise
+        
+        return len(rows)
+    
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, rows: List[Tuple[str, int, str]]):
+        conn.executemany(
+            'UPDATE memories SET last_accessed = ?, access_count = access_count + ? WHERE memory_id = ?',
+            rows
+        )
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush access statistics: {str(e)}")
+    
+    async def close(self):
+        """Cancel the flush timer and write any pending updates"""
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        self._timer = None
+        await self.flush()
+
 class MemorySystem:
     """Long-term memory system with ranking capabilities"""
     
     def __init__(self, db_path: str = "data/memory.db", 
-                vector_dimension: int = 768):
+                vector_dimension: int = 768,
+                index: Union[str, VectorIndex, None] = "ivf",
+                candidate_factor: int = 4,
+                search_mode: str = "ann",
+                readers: int = 4,
+                access_flush_size: int = 256,
+                access_flush_interval: float = 5.0,
+                embedding_dtype: str = "float32",
+                embedding_storage: str = "blob",
+                embedding_provider: EmbeddingProvider = None,
+                indexed_metadata_keys: List[str] = None,
+                dedup_threshold: float = None,
+                search_executor: Executor = None,
+                query_cache_size: int = 1024,
+                query_cache_ttl: Optional[float] = 300.0):
         """
         Initialize the memory system
         
         Args:
             db_path: Path to the SQLite database
             vector_dimension: Dimension of the embedding vectors
+            index: Vector index used by search ("ivf", None, or a VectorIndex)
+            candidate_factor: Candidates fetched from the index per requested
+                result, before re-ranking by importance
+            search_mode: Default search mode, "ann" (vector index) or "exact"
+            readers: Number of pooled SQLite reader connections
+            access_flush_size: Pending accessed memories that trigger a stats flush
+            access_flush_interval: Seconds before buffered access stats are flushed
+            embedding_dtype: Storage type for embeddings ("float64", "float32",
+                "float16" or "int8")
+            embedding_storage: "blob" to keep embeddings in SQLite, or "sidecar"
+                to append them to a memory-mapped file next to the database
+            embedding_provider: Provider used to embed content and queries
+                (defaults to a cached local hashing embedder)
+            indexed_metadata_keys: Top-level metadata keys that get an expression
+                index, so search(metadata=...) filters on them use an index
+            dedup_threshold: Cosine similarity at or above which a new memory is
+                merged into an existing one instead of stored (None disables)
+            search_executor: Thread pool for vector scoring; when set, index
+                searches run off the event loop so several systems can score
+                in parallel (None scores inline)
+            query_cache_size: Search result lists kept in the query cache
+                (0 disables it)
+            query_cache_ttl: Seconds a cached search result stays valid
         """
+        if search_mode not in ("ann", "exact"):
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        if embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {embedding_dtype}")
+        if embedding_storage not in ("blob", "sidecar"):
+            raise ValueError(f"Unknown embedding storage: {embedding_storage}")
+        
         self.db_path = db_path
         self.vector_dimension = vector_dimension
+        self.candidate_factor = max(1, candidate_factor)
+        self.search_mode = search_mode
+        self.embedding_dtype = embedding_dtype
+        self.embedding_storage = embedding_storage
+        self.indexed_metadata_keys = list(indexed_metadata_keys or [])
+        self.dedup_threshold = dedup_threshold
+        # Serializes duplicate checks with their inserts
+        self._dedup_lock = asyncio.Lock()
+        # Guards the vector indexes against scoring on search_executor threads
+        self.search_executor = search_executor
+        self._index_lock = threading.Lock()
+        
+        self.embedder = embedding_provider or CachedEmbeddingProvider(
+            HashingEmbeddingProvider(vector_dimension)
+        )
+        if self.embedder.dimension != vector_dimension:
+            raise ValueError(f"Embedding provider produces {self.embedder.dimension}-dimensional "
+                             f"vectors, expected {vector_dimension}")
         
         # Create database directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        # Initialize database
-        self._init_db()
+        # Embeddings may live in a sidecar file; open it whenever one exists
+        self.sidecar_path = os.path.splitext(db_path)[0] + ".vec"
+        self._sidecar: Optional[EmbeddingSidecar] = None
+        if embedding_storage == "sidecar" or os.path.exists(self.sidecar_path):
+            sidecar_dtype = "float32" if embedding_dtype == "int8" else embedding_dtype
+            self._sidecar = EmbeddingSidecar(self.sidecar_path, vector_dimension, sidecar_dtype)
+        # Bumped under the index lock each time compaction moves sidecar rows
+        self._compactions = 0
+        
+        # Open long-lived connections and initialize the database
+        self.db = ConnectionManager(db_path, readers=readers)
+        with self.db.transaction() as conn:
+            self._init_db(conn)
+            if embedding_storage == "sidecar":
+                self._move_blobs_to_sidecar(conn)
+        
+        # Access statistics are buffered and written in batches
+        self._access_stats = AccessStatsBuffer(self.db, access_flush_size, 
+                                               access_flush_interval)
+        
+        # Build the vector index from the stored embeddings
+        if isinstance(index, VectorIndex):
+            self.index = index
+        else:
+            self.index = create_index(index, vector_dimension)
+        # IVF training is run off the event loop, see _schedule_training
+        self._training_task: Optional[asyncio.Task] = None
+        if isinstance(self.index, IVFFlatIndex):
+            self.index.auto_train = False
+        if self.index is not None:
+            with self.db.reader() as conn:
+                self._load_index(conn, self.index)
+        
+        # Exact-search matrix, built on first use and then kept in sync
+        self._exact_index: Optional[VectorIndex] = None
+        self._exact_build_lock = asyncio.Lock()
+        # Index changes made while the exact index is being built, replayed
+        # onto it before it is published (None when no build is running)
+        self._exact_pending: Optional[List[tuple]] = None
+        
+        # Repeated searches are answered from here until the next write
+        self.query_cache = QueryCache(query_cache_size, query_cache_ttl) \
+            if query_cache_size > 0 else None
+        
+        # Background maintenance task, see start_maintenance
+        self._maintenance_task: Optional[asyncio.Task] = None
         
         logger.info(f"Memory system initialized with database at {db_path}")
     
-    def _init_db(self):
+    def _init_db(self, conn: sqlite3.Connection):
         """Initialize the database schema"""
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         # Create memories table
@@ -139,11 +832,415 @@ class MemorySystem:
         # Create index on tags
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_tags ON memory_tags(tag)')
         
-        conn.commit()
-        conn.close()
+        # Evicted memories are moved here by maintenance
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS memories_archive (
+            memory_id TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            embedding BLOB,
+            created_at TEXT NOT NULL,
+            last_accessed TEXT NOT NULL,
+            access_count INTEGER NOT NULL,
+            importance REAL NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+        ''')
+        
+        # Key/value state for maintenance tasks
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS memory_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        ''')
+        
+        # Indexes for search filters
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_created_at ON memories(created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_importance ON memories(importance)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_access_count ON memories(access_count)')
+        
+        # Row offset into the embedding sidecar file, when one is used
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(memories)')]
+        if "embedding_offset" not in columns:
+            cursor.execute('ALTER TABLE memories ADD COLUMN embedding_offset INTEGER')
+        if "fts_rowid" not in columns:
+            cursor.execute('ALTER TABLE memories ADD COLUMN fts_rowid INTEGER')
+        
+        for key in self.indexed_metadata_keys:
+            index_name = "idx_memories_meta_" + re.sub(r"\W", "_", key)
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {index_name} ON memories({self._metadata_expression(key)})'
+            )
+        
+        self.fts_enabled = self._init_fts(cursor)
+        self._init_aggregates(cursor)
+    
+    def _init_aggregates(self, cursor: sqlite3.Cursor):
+        """Create the trigger-maintained aggregate tables read by get_stats"""
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory_stats'"
+        ).fetchone()
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS memory_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL,
+            importance_sum REAL NOT NULL
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS memory_tag_counts (
+            tag TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_tag_counts_count ON memory_tag_counts(count)')
+        
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_stats_insert AFTER INSERT ON memories BEGIN
+            UPDATE memory_stats SET total = total + 1, importance_sum = importance_sum + new.importance
+            WHERE id = 1;
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_stats_delete AFTER DELETE ON memories BEGIN
+            UPDATE memory_stats SET total = total - 1, importance_sum = importance_sum - old.importance
+            WHERE id = 1;
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_stats_importance AFTER UPDATE OF importance ON memories BEGIN
+            UPDATE memory_stats SET importance_sum = importance_sum + new.importance - old.importance
+            WHERE id = 1;
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_tag_counts_insert AFTER INSERT ON memory_tags BEGIN
+            INSERT INTO memory_tag_counts (tag, count) VALUES (new.tag, 1)
+            ON CONFLICT(tag) DO UPDATE SET count = count + 1;
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_tag_counts_delete AFTER DELETE ON memory_tags BEGIN
+            UPDATE memory_tag_counts SET count = count - 1 WHERE tag = old.tag;
+            DELETE FROM memory_tag_counts WHERE tag = old.tag AND count <= 0;
+        END
+        ''')
+        
+        if not exists:
+            self._rebuild_aggregates(cursor)
+    
+    @staticmethod
+    def _rebuild_aggregates(cursor: sqlite3.Cursor):
+        """Recompute the aggregate tables from scratch"""
+        cursor.execute('''
+        INSERT OR REPLACE INTO memory_stats (id, total, importance_sum)
+        SELECT 1, COUNT(*), COALESCE(SUM(importance), 0) FROM memories
+        ''')
+        cursor.execute('DELETE FROM memory_tag_counts')
+        cursor.execute('''
+        INSERT INTO memory_tag_counts (tag, count)
+        SELECT tag, COUNT(*) FROM memory_tags GROUP BY tag
+        ''')
+    
+    def _init_fts(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the FTS5 mirror of memories.content and its sync triggers
+        
+        The FTS table keeps its own rowids (memories has no INTEGER PRIMARY
+        KEY, so its rowids may change on VACUUM); memories.fts_rowid links
+        each memory to its FTS row.
+        
+        Returns:
+            True if full-text search is available
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'"
+        ).fetchone()
+        
+        try:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts 
+            USING fts5(memory_id UNINDEXED, content)
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Full-text search unavailable, hybrid search will use vectors only: {str(e)}")
+            return False
+        
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts (memory_id, content) VALUES (new.memory_id, new.content);
+            UPDATE memories SET fts_rowid = last_insert_rowid() WHERE rowid = new.rowid;
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories BEGIN
+            DELETE FROM memories_fts WHERE rowid = old.fts_rowid;
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memories_fts_update AFTER UPDATE OF content ON memories BEGIN
+            UPDATE memories_fts SET content = new.content WHERE rowid = new.fts_rowid;
+        END
+        ''')
+        
+        if not exists:
+            # Index memories stored before full-text search was added
+            cursor.execute('''
+            INSERT INTO memories_fts (rowid, memory_id, content) 
+            SELECT rowid, memory_id, content FROM memories
+            ''')
+            cursor.execute('UPDATE memories SET fts_rowid = rowid')
+        
+        return True
+    
+    def _move_blobs_to_sidecar(self, conn: sqlite3.Connection, batch_size: int = 10000):
+        """Move embeddings stored as BLOBs into the sidecar file"""
+        moved = 0
+        while True:
+            rows = conn.execute(
+                '''
+                SELECT memory_id, embedding FROM memories
+                WHERE embedding IS NOT NULL AND embedding_offset IS NULL
+                LIMIT ?
+                ''',
+                (batch_size,)
+            ).fetchall()
+            
+            ids, vectors = [], []
+            for memory_id, blob in rows:
+                vector = decode_embedding(blob)
+                if vector.shape[0] == self.vector_dimension:
+                    ids.append(memory_id)
+                    vectors.append(vector)
+            if not ids:
+                break
+            
+            offsets = self._sidecar.append(np.stack(vectors))
+            conn.executemany(
+                'UPDATE memories SET embedding = NULL, embedding_offset = ? WHERE memory_id = ?',
+                list(zip(offsets, ids))
+            )
+            moved += len(ids)
+        
+        if moved:
+            logger.info(f"Moved {moved} embeddings into {self.sidecar_path}")
+    
+    async def close(self):
+        """Flush buffered statistics and release the database connections"""
+        await self.stop_maintenance()
+        if self._training_task is not None:
+            self._training_task.cancel()
+            try:
+                await self._training_task
+            except asyncio.CancelledError:
+                pass
+        await self._access_stats.close()
+        self.db.close()
+        self.embedder.close()
+    
+    async def __aenter__(self) -> 'MemorySystem':
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    def _load_index(self, conn: sqlite3.Connection, index: VectorIndex, 
+                   batch_size: int = 10000):
+        """Load every stored embedding into a vector index"""
+        with self._index_lock:
+            self._fill_index(conn, index, batch_size)
+            # Trained once over everything loaded rather than as it grows
+            if isinstance(index, IVFFlatIndex) and index.needs_training:
+                index.train()
+        
+        logger.info(f"Loaded {len(index)} embeddings into {type(index).__name__}")
+    
+    def _fill_index(self, conn: sqlite3.Connection, index: VectorIndex, batch_size: int,
+                   compactions: int = None):
+        """
+        Load every stored embedding into an index
+        
+        Without the index lock held, pass the compaction count taken before
+        the call: sidecar rows are then only copied while no compaction has
+        moved them, and the fill stops early once one has.
+        """
+        index.clear()
+        
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT memory_id, embedding, embedding_offset FROM memories
+            WHERE embedding IS NOT NULL OR embedding_offset IS NOT NULL
+            '''
+        )
+        
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            ids, vectors, row_ids, offsets = [], [], [], []
+            for memory_id, blob, offset in rows:
+                if offset is not None and self._sidecar is not None:
+                    row_ids.append(memory_id)
+                    offsets.append(offset)
+                elif blob is not None:
+                    vector = decode_embedding(blob)
+                    if vector.shape[0] == self.vector_dimension:
+                        ids.append(memory_id)
+                        vectors.append(vector)
+            if isinstance(index, MmapFlatIndex):
+                index.add_rows(row_ids, offsets)
+            elif row_ids:
+                if compactions is None:
+                    vectors.extend(self._sidecar.matrix[np.asarray(offsets, dtype=np.int64)])
+                else:
+                    with self._index_lock:
+                        if self._compactions != compactions:
+                            return
+                        vectors.extend(np.array(self._sidecar.matrix[np.asarray(offsets, dtype=np.int64)]))
+                ids.extend(row_ids)
+            if ids and not isinstance(index, MmapFlatIndex):
+                index.add(ids, np.stack(vectors))
+    
+    async def _get_exact_index(self) -> VectorIndex:
+        """
+        Return the cached exact-search matrix, building it on first use
+        
+        The build reads a snapshot without the index lock, since nothing
+        else can see the new index yet. Adds and removes made meanwhile are
+        logged and replayed onto it before it is published.
+        """
+        async with self._exact_build_lock:
+            while self._exact_index is None:
+                if self.embedding_storage == "sidecar":
+                    # Score the memory-mapped file in place
+                    exact_index = MmapFlatIndex(self.vector_dimension, lambda: self._sidecar.matrix)
+                else:
+                    exact_index = FlatIndex(self.vector_dimension)
+                
+                with self._index_lock:
+                    self._exact_pending = []
+                    compactions = self._compactions
+                await self.db.read(self._fill_index, exact_index, 10000, compactions)
+                with self._index_lock:
+                    pending, self._exact_pending = self._exact_pending, None
+                    # None means a compaction moved the rows, so build again
+                    if pending is not None:
+                        for operation, *args in pending:
+                            if operation == "add":
+                                self._add_to_index(exact_index, *args)
+                            else:
+                                exact_index.remove(*args)
+                        self._exact_index = exact_index
+        return self._exact_index
+    
+    def _invalidate_queries(self):
+        """Note a write that may change search results"""
+        if self.query_cache is not None:
+            self.query_cache.invalidate()
+    
+    def _indexes(self) -> List[VectorIndex]:
+        """The vector indexes currently kept in sync with the database"""
+        return [index for index in (self.index, self._exact_index) if index is not None]
+    
+    def _index_add(self, *memories: Memory, offsets: Dict[str, int] = None):
+        """Add memories' embeddings to the vector indexes"""
+        offsets = offsets or {}
+        ids, vectors = [], []
+        for memory in memories:
+            if memory.embedding is None:
+                continue
+            if memory.embedding.shape[-1] != self.vector_dimension:
+                logger.warning(f"Not indexing memory {memory.memory_id}: "
+                               f"embedding dimension {memory.embedding.shape[-1]}")
+                continue
+            ids.append(memory.memory_id)
+            vectors.append(memory.embedding)
+        if not ids:
+            return
+        vectors = np.stack(vectors)
+        with self._index_lock:
+            for index in self._indexes():
+                self._add_to_index(index, ids, vectors, offsets)
+            if self._exact_pending is not None:
+                self._exact_pending.append(("add", ids, vectors, offsets))
+        self._schedule_training()
+    
+    @staticmethod
+    def _add_to_index(index: VectorIndex, ids: List[str], vectors: np.ndarray, 
+                      offsets: Dict[str, int]):
+        if isinstance(index, MmapFlatIndex):
+            index.add_rows([memory_id for memory_id in ids if memory_id in offsets],
+                           [offsets[memory_id] for memory_id in ids if memory_id in offsets])
+        else:
+            index.add(ids, vectors)
+    
+    def _schedule_training(self):
+        """Start training the IVF index in the background once it needs it"""
+        if not isinstance(self.index, IVFFlatIndex) or not self.index.needs_training:
+            return
+        if self._training_task is not None and not self._training_task.done():
+            return
+        self._training_task = asyncio.get_running_loop().create_task(self._train_index(self.index))
+    
+    async def _train_index(self, index: IVFFlatIndex):
+        """
+        Retrain an IVF index without blocking the event loop or searches
+        
+        The k-means pass and reassignment run on a worker thread against a
+        snapshot; the index lock is only held to take the snapshot and to
+        swap the new lists in.
+        """
+        def fit():
+            with self._index_lock:
+                ids, vectors = index.begin_training()
+            return index.fit(ids, vectors)
+        
+        loop = asyncio.get_running_loop()
+        try:
+            trained = await loop.run_in_executor(None, fit)
+        except asyncio.CancelledError:
+            with self._index_lock:
+                index.abort_training()
+            raise
+        except Exception as e:
+            with self._index_lock:
+                index.abort_training()
+            logger.error(f"Vector index training failed: {str(e)}")
+            return
+        
+        with self._index_lock:
+            index.finish_training(trained)
+        # Candidates come from different lists now
+        self._invalidate_queries()
+    
+    def _index_remove(self, memory_ids: List[str]):
+        """Remove memories from the vector indexes"""
+        with self._index_lock:
+            for index in self._indexes():
+                index.remove(memory_ids)
+            if self._exact_pending is not None:
+                self._exact_pending.append(("remove", memory_ids))
+    
+    async def _index_search(self, index: VectorIndex, query_embedding: np.ndarray, k: int,
+                           allowed: List[str] = None) -> List[Tuple[str, float]]:
+        """Score the query against an index, restricted to `allowed` IDs when given"""
+        def score():
+            with self._index_lock:
+                if allowed is None:
+                    return index.search(query_embedding, k)
+                return index.search_subset(query_embedding, allowed, k)
+        
+        if self.search_executor is None:
+            return score()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.search_executor, score)
     
     async def store(self, content: str, metadata: Dict[str, Any] = None, 
-                   embedding: np.ndarray = None, importance: float = None) -> Memory:
+                   embedding: np.ndarray = None, importance: float = None,
+                   memory_id: str = None) -> Memory:
         """
         Store a new memory
         
@@ -152,6 +1249,7 @@ class MemorySystem:
             metadata: Additional metadata about the memory
             embedding: Vector embedding of the content
             importance: Importance score (0-1)
+            memory_id: ID for the memory (generated when omitted)
             
         Returns:
             The stored memory
@@ -159,7 +1257,7 @@ class MemorySystem:
         metadata = metadata or {}
         
         # Create memory object
-        memory = Memory(content, metadata, embedding)
+        memory = Memory(content, metadata, embedding, memory_id)
         
         # Set importance if provided
         if importance is not None:
@@ -169,66 +1267,291 @@ class MemorySystem:
         if embedding is None:
             memory.embedding = await self._generate_embedding(content)
         
-        # Extract tags from metadata
-        tags = metadata.get("tags", [])
-        if isinstance(tags, str):
-            tags = [tag.strip() for tag in tags.split(",")]
-        
-        # Store in database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            '''
-            INSERT INTO memories 
-            (memory_id, content, metadata, embedding, created_at, last_accessed, access_count, importance)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''',
-            (
-                memory.memory_id,
-                memory.content,
-                json.dumps(memory.metadata),
-                memory.embedding.tobytes() if memory.embedding is not None else None,
-                memory.created_at.isoformat(),
-                memory.last_accessed.isoformat(),
-                memory.access_count,
-                memory.importance
-            )
-        )
-        
-        # Store tags
-        for tag in tags:
-            cursor.execute(
-                'INSERT INTO memory_tags (memory_id, tag) VALUES (?, ?)',
-                (memory.memory_id, tag)
-            )
+        tags = self._extract_tags(metadata)
         
-        conn.commit()
-        conn.close()
+        # Store in database (or merge into a near-duplicate)
+        stored = (await self._write_memories([memory]))[0]
         
-        logger.info(f"Stored memory {memory.memory_id} with {len(tags)} tags")
-        return memory
+        if stored is memory:
+            logger.info(f"Stored memory {memory.memory_id} with {len(tags)} tags")
+        else:
+            logger.info(f"Merged new memory into near-duplicate {stored.memory_id}")
+        return stored
     
-    async def retrieve(self, memory_id: str) -> Optional[Memory]:
+    async def store_many(self, items: Union[Iterable[Any], AsyncIterable[Any]], 
+                        batch_size: int = 256, 
+                        return_memories: bool = True) -> List[Memory]:
         """
-        Retrieve a specific memory by ID
+        Store many memories in batches
+        
+        Each item is either a content string or a dict with "content" and
+        optional "metadata", "embedding", "importance" and "memory_id" keys. Embeddings
+        are generated per batch and every batch is written in a single
+        transaction, so an async iterator can stream an import of any size.
         
         Args:
-            memory_id: ID of the memory to retrieve
+            items: Iterable or async iterable of items to store
+            batch_size: Number of items embedded and written together
+            return_memories: Keep and return the stored memories; pass False
+                for large imports to keep memory use bounded
             
         Returns:
-            The memory if found, None otherwise
+            The stored memories (empty when return_memories is False); an item
+            merged into a near-duplicate is represented by the memory it merged into
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        batch_size = max(1, batch_size)
+        stored: List[Memory] = []
+        batch: List[Any] = []
+        total = 0
+        
+        async for item in self._iterate(items):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                memories = await self._store_batch(batch)
+                total += len(memories)
+                if return_memories:
+                    stored.extend(memories)
+                batch = []
+        
+        if batch:
+            memories = await self._store_batch(batch)
+            total += len(memories)
+            if return_memories:
+                stored.extend(memories)
+        
+        logger.info(f"Stored {total} memories in batches of {batch_size}")
+        return stored
+    
+    async def _store_batch(self, items: List[Any]) -> List[Memory]:
+        """Embed and insert one batch of store_many items"""
+        memories = []
+        for item in items:
+            if isinstance(item, str):
+                item = {"content": item}
+            memory = Memory(item["content"], item.get("metadata") or {}, 
+                            item.get("embedding"), memory_id=item.get("memory_id"))
+            if item.get("importance") is not None:
+                memory.importance = max(0.0, min(1.0, item["importance"]))
+            memories.append(memory)
+        
+        # Generate missing embeddings for the whole batch at once
+        missing = [memory for memory in memories if memory.embedding is None]
+        if missing:
+            embeddings = await self._generate_embeddings([memory.content for memory in missing])
+            for memory, embedding in zip(missing, embeddings):
+                memory.embedding = embedding
+        
+        return await self._write_memories(memories)
+    
+    async def _write_memories(self, memories: List[Memory]) -> List[Memory]:
+        """Insert memories, merging near-duplicates when deduplication is enabled"""
+        try:
+            if self.dedup_threshold is None:
+                offsets = await self.db.write(self._insert_memories, memories)
+                self._index_add(*memories, offsets=offsets)
+                return memories
+            
+            async with self._dedup_lock:
+                return await self._write_deduplicated(memories)
+        finally:
+            # Only once the rows and the index are updated, or a search running
+            # alongside the write would cache results without these memories
+            self._invalidate_queries()
+    
+    async def _write_deduplicated(self, memories: List[Memory]) -> List[Memory]:
+        """Insert new memories and merge duplicates in a single transaction"""
+        index = self.index if self.index is not None else await self._get_exact_index()
+        # Catches duplicates within the batch, which are not in the index yet
+        batch_index = FlatIndex(self.vector_dimension)
+        
+        new: Dict[str, Memory] = {}
+        merges: Dict[str, List[Memory]] = {}
+        results: List[Union[Memory, str]] = []
+        for memory in memories:
+            target = None
+            if memory.embedding is not None and memory.embedding.shape[-1] == self.vector_dimension:
+                best = 0.0
+                for candidates in (index.search(memory.embedding, 1), 
+                                   batch_index.search(memory.embedding, 1)):
+                    if candidates and candidates[0][1] >= self.dedup_threshold \
+                            and candidates[0][1] > best:
+                        target, best = candidates[0]
+            
+            if target is None:
+                new[memory.memory_id] = memory
+                if memory.embedding is not None and memory.embedding.shape[-1] == self.vector_dimension:
+                    batch_index.add([memory.memory_id], memory.embedding[np.newaxis, :])
+                results.append(memory)
+            elif target in new:
+                self._merge_pending(new[target], memory)
+                results.append(new[target])
+            else:
+                merges.setdefault(target, []).append(memory)
+                results.append(target)
+        
+        def write(conn):
+            # A target forgotten since the duplicate check is replaced by its
+            # first duplicate, with the others merged into that one
+            replacements: Dict[str, Memory] = {}
+            for target_id, duplicates in merges.items():
+                if not self._merge_duplicates(conn, target_id, duplicates):
+                    for duplicate in duplicates[1:]:
+                        self._merge_pending(duplicates[0], duplicate)
+                    replacements[target_id] = duplicates[0]
+            inserted = list(new.values()) + list(replacements.values())
+            offsets = self._insert_memories(conn, inserted)
+            rows = self._select_rows(conn, [target_id for target_id in merges 
+                                            if target_id not in replacements])
+            return inserted, offsets, replacements, rows
+        
+        inserted, offsets, replacements, rows = await self.db.write(write)
+        self._index_add(*inserted, offsets=offsets)
+        
+        merged: Dict[str, Memory] = dict(replacements)
+        merged.update((memory_id, self._row_to_memory(row)) for memory_id, row in rows.items())
+        return [result if isinstance(result, Memory) else merged[result] for result in results]
+    
+    def _merge_pending(self, target: Memory, duplicate: Memory):
+        """Merge a duplicate into a memory that has not been written yet"""
+        target.access_count += 1
+        target.importance = max(target.importance, duplicate.importance)
+        tags = self._extract_tags(target.metadata)
+        new_tags = [tag for tag in self._extract_tags(duplicate.metadata) if tag not in tags]
+        if new_tags:
+            target.metadata = dict(target.metadata, tags=tags + new_tags)
+    
+    def _merge_duplicates(self, conn: sqlite3.Connection, target_id: str, 
+                         duplicates: List[Memory]) -> bool:
+        """
+        Fold duplicates into a stored memory: bump access stats, keep the highest importance, merge tags
         
-        cursor.execute(
-            'SELECT * FROM memories WHERE memory_id = ?',
-            (memory_id,)
+        Returns:
+            False if the memory no longer exists
+        """
+        row = conn.execute('SELECT metadata FROM memories WHERE memory_id = ?', (target_id,)).fetchone()
+        if row is None:
+            return False
+        metadata = json.loads(row[0])
+        tags = self._extract_tags(metadata)
+        new_tags = []
+        for duplicate in duplicates:
+            new_tags.extend(tag for tag in self._extract_tags(duplicate.metadata) 
+                            if tag not in tags and tag not in new_tags)
+        if new_tags:
+            metadata["tags"] = tags + new_tags
+        
+        conn.execute(
+            '''
+            UPDATE memories SET access_count = access_count + ?, last_accessed = ?,
+                importance = MAX(importance, ?), metadata = ?
+            WHERE memory_id = ?
+            ''',
+            (
+                len(duplicates),
+                datetime.now().isoformat(),
+                max(duplicate.importance for duplicate in duplicates),
+                json.dumps(metadata),
+                target_id
+            )
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO memory_tags (memory_id, tag) VALUES (?, ?)',
+            [(target_id, tag) for tag in new_tags]
         )
+        return True
+    
+    @staticmethod
+    async def _iterate(items: Union[Iterable[Any], AsyncIterable[Any]]):
+        """Iterate over a sync or async iterable"""
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
+    
+    @staticmethod
+    def _extract_tags(metadata: Dict[str, Any]) -> List[str]:
+        """Extract the tag list from memory metadata"""
+        tags = metadata.get("tags", [])
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(",")]
+        return tags
+    
+    def _insert_memories(self, conn: sqlite3.Connection, 
+                        memories: List[Memory]) -> Dict[str, int]:
+        """
+        Insert memories and their tags using the given connection
         
-        row = cursor.fetchone()
-        conn.close()
+        Returns:
+            Sidecar row offsets of the inserted embeddings, by memory ID
+        """
+        cursor = conn.cursor()
+        
+        # In sidecar mode, append embeddings to the file and store only offsets
+        offsets: Dict[str, int] = {}
+        if self.embedding_storage == "sidecar":
+            appendable = [memory for memory in memories 
+                          if memory.embedding is not None 
+                          and memory.embedding.shape[-1] == self.vector_dimension]
+            if appendable:
+                rows = self._sidecar.append(np.stack([memory.embedding for memory in appendable]))
+                offsets = {memory.memory_id: row for memory, row in zip(appendable, rows)}
+        
+        cursor.executemany(
+            '''
+            INSERT INTO memories 
+            (memory_id, content, metadata, embedding, created_at, last_accessed, access_count, 
+             importance, embedding_offset)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''',
+            [
+                (
+                    memory.memory_id,
+                    memory.content,
+                    json.dumps(memory.metadata),
+                    encode_embedding(memory.embedding, self.embedding_dtype) 
+                    if memory.embedding is not None and memory.memory_id not in offsets else None,
+                    memory.created_at.isoformat(),
+                    memory.last_accessed.isoformat(),
+                    memory.access_count,
+                    memory.importance,
+                    offsets.get(memory.memory_id)
+                )
+                for memory in memories
+            ]
+        )
+        
+        # Store tags
+        cursor.executemany(
+            'INSERT OR IGNORE INTO memory_tags (memory_id, tag) VALUES (?, ?)',
+            [(memory.memory_id, tag) 
+             for memory in memories 
+             for tag in self._extract_tags(memory.metadata)]
+        )
+        
+        return offsets
+    
+    async def retrieve(self, memory_id: str) -> Optional[Memory]:
+        """
+        Retrieve a specific memory by ID
+        
+        Args:
+            memory_id: ID of the memory to retrieve
+            
+        Returns:
+            The memory if found, None otherwise
+        """
+        def select(conn):
+            compactions = self._compactions
+            cursor = conn.execute(
+                'SELECT * FROM memories WHERE memory_id = ?',
+                (memory_id,)
+            )
+            row = cursor.fetchone()
+            return self._read_sidecar_rows(conn, [row], compactions)[0] if row else None
+        
+        row = await self.db.read(select)
         
         if not row:
             return None
@@ -239,53 +1562,299 @@ class MemorySystem:
         # Convert row to Memory object
         return self._row_to_memory(row)
     
-    async def search(self, query: str, limit: int = 5) -> List[Memory]:
+    async def search(self, query: str, limit: int = 5, mode: str = None,
+                    tags_any: List[str] = None, tags_all: List[str] = None,
+                    created_after: Union[datetime, str] = None, 
+                    created_before: Union[datetime, str] = None,
+                    min_importance: float = None, 
+                    metadata: Dict[str, Any] = None) -> List[Memory]:
         """
         Search for memories semantically similar to the query
         
+        Filters are evaluated in SQL first; vector similarity is then only
+        computed for the memories that pass them.
+        
         Args:
             query: The search query
             limit: Maximum number of results to return
+            mode: "ann" to use the vector index or "exact" to score every
+                memory (defaults to the system's search_mode)
+            tags_any: Only memories with at least one of these tags
+            tags_all: Only memories with all of these tags
+            created_after: Only memories created at or after this time
+            created_before: Only memories created before this time
+            min_importance: Only memories with at least this importance
+            metadata: Only memories whose metadata has these key/value pairs
             
         Returns:
             List of matching memories
         """
+        mode = mode or self.search_mode
+        if mode not in ("ann", "exact"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        
+        where, params = self._filter_clause(tags_any, tags_all, created_after, 
+                                            created_before, min_importance, metadata)
+        
         # Generate query embedding
         query_embedding = await self._generate_embedding(query)
         
-        # Search in database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cache_key = None
+        if self.query_cache is not None:
+            cache_key = QueryCache.make_key(query_embedding, limit, mode, where, params)
+            top_memories = self.query_cache.get(cache_key)
+            generation = self.query_cache.generation
         
-        # Get all memories with embeddings
-        cursor.execute('SELECT * FROM memories WHERE embedding IS NOT NULL')
-        rows = cursor.fetchall()
-        conn.close()
+        if cache_key is None or top_memories is None:
+            scored = await self._search_scored(query_embedding, limit, mode, where, params)
+            top_memories = [memory for memory, _ in scored]
+            if cache_key is not None:
+                self.query_cache.put(cache_key, top_memories, generation)
         
-        if not rows:
+        # Update access stats for top results
+        await self._update_access(*[memory.memory_id for memory in top_memories])
+        
+        return top_memories
+    
+    async def _search_scored(self, query_embedding: np.ndarray, limit: int, mode: str,
+                            where: str, params: List[Any]) -> List[Tuple[Memory, float]]:
+        """Run a vector search and return the top memories with their combined scores"""
+        if mode == "ann" and self.index is not None:
+            index = self.index
+        else:
+            index = await self._get_exact_index()
+        
+        allowed = await self.db.read(self._filtered_ids, where, params) if where else None
+        candidates = await self._index_search(index, query_embedding, 
+                                              limit * self.candidate_factor, allowed)
+        
+        return (await self._score_candidates(candidates))[:limit]
+    
+    def _filter_clause(self, tags_any: List[str] = None, tags_all: List[str] = None,
+                      created_after: Union[datetime, str] = None, 
+                      created_before: Union[datetime, str] = None,
+                      min_importance: float = None, 
+                      metadata: Dict[str, Any] = None) -> Tuple[str, List[Any]]:
+        """Build a WHERE clause over memories for the search filters"""
+        conditions, params = [], []
+        
+        if tags_any:
+            placeholders = ",".join("?" * len(tags_any))
+            conditions.append(
+                f'memory_id IN (SELECT memory_id FROM memory_tags WHERE tag IN ({placeholders}))'
+            )
+            params.extend(tags_any)
+        
+        if tags_all:
+            tags_all = list(dict.fromkeys(tags_all))
+            placeholders = ",".join("?" * len(tags_all))
+            conditions.append(
+                f'''memory_id IN (SELECT memory_id FROM memory_tags WHERE tag IN ({placeholders})
+                   GROUP BY memory_id HAVING COUNT(*) = ?)'''
+            )
+            params.extend(tags_all)
+            params.append(len(tags_all))
+        
+        if created_after is not None:
+            conditions.append('created_at >= ?')
+            params.append(created_after.isoformat() if isinstance(created_after, datetime) 
+                          else created_after)
+        
+        if created_before is not None:
+            conditions.append('created_at < ?')
+            params.append(created_before.isoformat() if isinstance(created_before, datetime) 
+                          else created_before)
+        
+        if min_importance is not None:
+            conditions.append('importance >= ?')
+            params.append(min_importance)
+        
+        for key, value in (metadata or {}).items():
+            if isinstance(value, bool):
+                value = int(value)
+            elif isinstance(value, (dict, list)):
+                value = json.dumps(value, separators=(",", ":"))
+            conditions.append(f'{self._metadata_expression(key)} = ?')
+            params.append(value)
+        
+        return " AND ".join(conditions), params
+    
+    @staticmethod
+    def _metadata_expression(key: str) -> str:
+        """SQL expression for a top-level metadata key (matches its expression index)"""
+        if not re.fullmatch(r"[\w\-]+", key):
+            raise ValueError(f"Unsupported metadata filter key: {key!r}")
+        return f"json_extract(metadata, '$.\"{key}\"')"
+    
+    @staticmethod
+    def _filtered_ids(conn: sqlite3.Connection, where: str, params: List[Any]) -> List[str]:
+        """IDs of the memories matching a filter clause (no embeddings loaded)"""
+        cursor = conn.execute(f'SELECT memory_id FROM memories WHERE {where}', params)
+        return [row[0] for row in cursor.fetchall()]
+    
+    async def _score_candidates(self, candidates: List[Tuple[str, float]]) -> List[Tuple[Memory, float]]:
+        """Load candidate memories and re-rank them by similarity and importance"""
+        if not candidates:
             return []
         
-        # Calculate similarities and rank
-        memories = [self._row_to_memory(row) for row in rows]
-        similarities = []
+        # Load only the candidate rows
+        rows = await self.db.read(self._select_rows, [memory_id for memory_id, _ in candidates])
         
-        for memory in memories:
-            if memory.embedding is not None:
-                similarity = self._cosine_similarity(query_embedding, memory.embedding)
-                # Combine similarity with importance for ranking
+        # Combine similarity with importance for ranking
+        similarities = []
+        for memory_id, similarity in candidates:
+            if memory_id in rows:
+                memory = self._row_to_memory(rows[memory_id])
                 combined_score = 0.7 * similarity + 0.3 * memory.importance
                 similarities.append((memory, combined_score))
         
-        # Sort by combined score
         similarities.sort(key=lambda x: x[1], reverse=True)
+        return similarities
+    
+    async def hybrid_search(self, query: str, limit: int = 5, keyword_limit: int = 100,
+                           rrf_k: int = 60, prefilter: bool = True) -> List[Memory]:
+        """
+        Search by combining BM25 keyword matches with vector similarity
         
-        # Update access stats for top results
-        top_memories = [mem for mem, _ in similarities[:limit]]
-        for memory in top_memories:
-            await self._update_access(memory.memory_id)
+        Both result lists are fused with reciprocal-rank fusion. When the
+        keyword search alone returns at least `limit` matches and prefilter
+        is set, vector similarity is only computed for those matches.
+        
+        Args:
+            query: The search query
+            limit: Maximum number of results to return
+            keyword_limit: Maximum number of BM25 matches considered
+            rrf_k: Reciprocal-rank fusion constant
+            prefilter: Restrict vector scoring to keyword matches when there are enough
+            
+        Returns:
+            List of matching memories
+        """
+        query_embedding = await self._generate_embedding(query)
+        
+        keyword_hits = []
+        if self.fts_enabled:
+            keyword_hits = await self.db.read(self._keyword_search, query, keyword_limit)
+        
+        memories: Dict[str, Memory] = {}
+        if prefilter and len(keyword_hits) >= limit:
+            # Keyword-heavy query: score only the keyword candidates
+            rows = await self.db.read(self._select_rows, [memory_id for memory_id, _ in keyword_hits])
+            memories = {memory_id: self._row_to_memory(row) for memory_id, row in rows.items()}
+            vector_hits = self._score_memories(query_embedding, list(memories.values()))
+        else:
+            index = self.index if self.index is not None else await self._get_exact_index()
+            vector_hits = await self._index_search(index, query_embedding, 
+                                                   limit * self.candidate_factor)
+        
+        # Reciprocal-rank fusion
+        fused: Dict[str, float] = {}
+        for hits in (keyword_hits, vector_hits):
+            for rank, (memory_id, _) in enumerate(hits):
+                fused[memory_id] = fused.get(memory_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+        
+        ranked = sorted(fused, key=fused.get, reverse=True)[:limit]
+        missing = [memory_id for memory_id in ranked if memory_id not in memories]
+        if missing:
+            rows = await self.db.read(self._select_rows, missing)
+            memories.update((memory_id, self._row_to_memory(row)) for memory_id, row in rows.items())
+        
+        top_memories = [memories[memory_id] for memory_id in ranked if memory_id in memories]
+        await self._update_access(*[memory.memory_id for memory in top_memories])
         
         return top_memories
     
+    @staticmethod
+    def _keyword_search(conn: sqlite3.Connection, query: str, limit: int) -> List[Tuple[str, float]]:
+        """Run a BM25-ranked FTS5 query, returning (memory_id, bm25) pairs best first"""
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        # Quote every term so user input cannot inject FTS5 query syntax
+        match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+        cursor = conn.execute(
+            '''
+            SELECT memory_id, bm25(memories_fts) AS score FROM memories_fts
+            WHERE memories_fts MATCH ? ORDER BY score LIMIT ?
+            ''',
+            (match, limit)
+        )
+        return cursor.fetchall()
+    
+    def _score_memories(self, query_embedding: np.ndarray, 
+                       memories: List[Memory]) -> List[Tuple[str, float]]:
+        """Cosine similarity of a query with each memory, best first"""
+        scored = [memory for memory in memories 
+                  if memory.embedding is not None 
+                  and memory.embedding.shape[-1] == query_embedding.shape[-1]]
+        if not scored:
+            return []
+        matrix = np.stack([memory.embedding for memory in scored]).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1.0
+        query_norm = np.linalg.norm(query_embedding) or 1.0
+        similarities = (matrix @ query_embedding.astype(np.float32)) / (norms * query_norm)
+        order = np.argsort(-similarities, kind="stable")
+        return [(scored[i].memory_id, float(similarities[i])) for i in order]
+    
+    def _select_rows(self, conn: sqlite3.Connection, memory_ids: List[str]) -> Dict[str, tuple]:
+        """Fetch memory rows by ID, keyed by memory ID, with sidecar embeddings"""
+        compactions = self._compactions
+        rows = []
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(memory_ids), 500):
+            chunk = memory_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(
+                f'SELECT * FROM memories WHERE memory_id IN ({placeholders})',
+                chunk
+            )
+            rows.extend(cursor.fetchall())
+        return {row[0]: row for row in self._read_sidecar_rows(conn, rows, compactions)}
+    
+    def _read_sidecar_rows(self, conn: sqlite3.Connection, rows: List[tuple],
+                          compactions: int) -> List[tuple]:
+        """
+        Put sidecar embeddings in the embedding column of selected rows
+        
+        Offsets are only valid until the next compaction, so the vectors are
+        copied under the index lock, after selecting the offsets again if a
+        compaction has finished since the rows were read (compactions is the
+        count taken before the SELECT). Rows need the memory ID first and
+        the embedding and embedding_offset columns in their table positions.
+        """
+        pending = [i for i, row in enumerate(rows) if row[3] is None and row[8] is not None]
+        if not pending or self._sidecar is None:
+            return rows
+        
+        with self._index_lock:
+            offsets = {rows[i][0]: rows[i][8] for i in pending}
+            if self._compactions != compactions:
+                moved = self._select_offsets(conn, list(offsets))
+                offsets = {memory_id: moved.get(memory_id) for memory_id in offsets}
+            found = [i for i in pending if offsets[rows[i][0]] is not None]
+            vectors = np.array(self._sidecar.matrix[
+                np.asarray([offsets[rows[i][0]] for i in found], dtype=np.int64)
+            ])
+        
+        rows = list(rows)
+        for i, vector in zip(found, vectors):
+            rows[i] = rows[i][:3] + (vector,) + rows[i][4:]
+        return rows
+    
+    @staticmethod
+    def _select_offsets(conn: sqlite3.Connection, memory_ids: List[str]) -> Dict[str, int]:
+        """Fetch the sidecar offsets of memories by ID"""
+        offsets = {}
+        for start in range(0, len(memory_ids), 500):
+            chunk = memory_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            offsets.update(conn.execute(
+                f'SELECT memory_id, embedding_offset FROM memories WHERE memory_id IN ({placeholders})',
+                chunk
+            ).fetchall())
+        return offsets
+    
     async def search_by_tag(self, tag: str, limit: int = 10) -> List[Memory]:
         """
         Search for memories by tag
@@ -297,28 +1866,26 @@ class MemorySystem:
         Returns:
             List of matching memories
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            '''
-            SELECT m.* FROM memories m
-            JOIN memory_tags t ON m.memory_id = t.memory_id
-            WHERE t.tag = ?
-            ORDER BY m.importance DESC, m.last_accessed DESC
-            LIMIT ?
-            ''',
-            (tag, limit)
-        )
+        def select(conn):
+            compactions = self._compactions
+            cursor = conn.execute(
+                '''
+                SELECT m.* FROM memories m
+                JOIN memory_tags t ON m.memory_id = t.memory_id
+                WHERE t.tag = ?
+                ORDER BY m.importance DESC, m.last_accessed DESC
+                LIMIT ?
+                ''',
+                (tag, limit)
+            )
+            return self._read_sidecar_rows(conn, cursor.fetchall(), compactions)
         
-        rows = cursor.fetchall()
-        conn.close()
+        rows = await self.db.read(select)
         
         memories = [self._row_to_memory(row) for row in rows]
         
         # Update access stats
-        for memory in memories:
-            await self._update_access(memory.memory_id)
+        await self._update_access(*[memory.memory_id for memory in memories])
         
         return memories
     
@@ -335,18 +1902,16 @@ class MemorySystem:
         """
         importance = max(0.0, min(1.0, importance))
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'UPDATE memories SET importance = ? WHERE memory_id = ?',
-            (importance, memory_id)
-        )
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        def update(conn):
+            cursor = conn.execute(
+                'UPDATE memories SET importance = ? WHERE memory_id = ?',
+                (importance, memory_id)
+            )
+            return cursor.rowcount > 0
         
+        success = await self.db.write(update)
+        if success:
+            self._invalidate_queries()
         return success
     
     async def forget(self, memory_id: str) -> bool:
@@ -359,20 +1924,557 @@ class MemorySystem:
         Returns:
             True if successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        def delete(conn):
+            cursor = conn.execute(
+                'DELETE FROM memories WHERE memory_id = ?',
+                (memory_id,)
+            )
+            return cursor.rowcount > 0
         
-        cursor.execute(
-            'DELETE FROM memories WHERE memory_id = ?',
-            (memory_id,)
-        )
+        success = await self.db.write(delete)
         
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        if success:
+            self._index_remove([memory_id])
+            self._invalidate_queries()
         
         return success
     
+    async def migrate_embeddings(self, dtype: str = None, batch_size: int = 1000, 
+                                vacuum: bool = True) -> int:
+        """
+        Rewrite stored embeddings in a new storage type
+        
+        Args:
+            dtype: Target storage type (defaults to the system's embedding_dtype)
+            batch_size: Rows rewritten per transaction
+            vacuum: Run VACUUM afterwards so the file actually shrinks
+            
+        Returns:
+            Number of embeddings rewritten
+        """
+        dtype = dtype or self.embedding_dtype
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        
+        def select(conn, after):
+            cursor = conn.execute(
+                '''
+                SELECT rowid, memory_id, embedding FROM memories
+                WHERE embedding IS NOT NULL AND rowid > ?
+                ORDER BY rowid LIMIT ?
+                ''',
+                (after, batch_size)
+            )
+            return cursor.fetchall()
+        
+        def update(conn, rows):
+            conn.executemany('UPDATE memories SET embedding = ? WHERE memory_id = ?', rows)
+        
+        rewritten = 0
+        last_rowid = 0
+        while True:
+            rows = await self.db.read(select, last_rowid)
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+            updates = [
+                (encode_embedding(decode_embedding(blob), dtype), memory_id)
+                for _, memory_id, blob in rows
+                if embedding_blob_dtype(blob) != dtype
+            ]
+            if updates:
+                await self.db.write(update, updates)
+                rewritten += len(updates)
+        
+        self.embedding_dtype = dtype
+        if vacuum and rewritten:
+            # A full VACUUM is also when existing databases can switch auto_vacuum mode
+            def vacuum_db(conn):
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            
+            await self.db.run_exclusive(vacuum_db)
+        
+        if rewritten:
+            self._invalidate_queries()
+        logger.info(f"Migrated {rewritten} embeddings to {dtype}")
+        return rewritten
+    
+    async def compact_embeddings(self) -> int:
+        """
+        Rewrite the sidecar file without the rows of forgotten memories
+        
+        Live rows are copied to a new file in offset order, their offsets are
+        updated in the same transaction and the new file replaces the old one.
+        The swap, the commit and the rebuild of the in-place exact index
+        happen under the index lock, which is also held wherever offsets are
+        looked up in the file; readers that selected offsets before the swap
+        see the compaction count change and select them again.
+        
+        Returns:
+            Number of sidecar rows reclaimed
+        """
+        if self._sidecar is None:
+            return 0
+        
+        temp_path = self.sidecar_path + ".compact"
+        backup_path = self.sidecar_path + ".old"
+        
+        def compact(conn):
+            rows = conn.execute(
+                '''
+                SELECT memory_id, embedding_offset FROM memories
+                WHERE embedding_offset IS NOT NULL ORDER BY embedding_offset
+                '''
+            ).fetchall()
+            reclaimed = len(self._sidecar) - len(rows)
+            if reclaimed <= 0:
+                return 0
+            
+            self._sidecar.write_compacted(temp_path, [offset for _, offset in rows])
+            conn.executemany(
+                'UPDATE memories SET embedding_offset = ? WHERE memory_id = ?',
+                [(new_offset, memory_id) for new_offset, (memory_id, _) in enumerate(rows)]
+            )
+            
+            # Swap files, commit the new offsets and rebuild the in-place
+            # index together, so no search scores one against the other
+            with self._index_lock:
+                os.replace(self.sidecar_path, backup_path)
+                os.replace(temp_path, self.sidecar_path)
+                self._sidecar.reload()
+                conn.commit()
+                os.remove(backup_path)
+                self._compactions += 1
+                if isinstance(self._exact_index, MmapFlatIndex):
+                    self._fill_index(conn, self._exact_index, 10000)
+                # An exact index being built may hold old offsets
+                self._exact_pending = None
+            return reclaimed
+        
+        try:
+            reclaimed = await self.db.write(compact)
+        except Exception:
+            if os.path.exists(backup_path):
+                os.replace(backup_path, self.sidecar_path)
+                self._sidecar.reload()
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        logger.info(f"Compacted {self.sidecar_path}, reclaimed {reclaimed} rows")
+        return reclaimed
+    
+    async def decay_importance(self, half_life_days: float = 30.0, 
+                              min_idle_days: float = 1.0, batch_size: int = 5000) -> int:
+        """
+        Decay the importance of memories that have not been accessed recently
+        
+        Importance halves every half_life_days of idleness. The half-life is
+        stretched by frequently accessed memories (by 1 + ln(1 + access_count)).
+        Each run only applies the idle time since the previous run, so
+        running it often does not decay memories faster.
+        
+        Args:
+            half_life_days: Idle days after which an unaccessed memory's importance halves
+            min_idle_days: Memories accessed more recently than this are left alone
+            batch_size: Rows updated per transaction
+            
+        Returns:
+            Number of memories whose importance changed
+        """
+        await self._access_stats.flush()
+        
+        now = datetime.now()
+        last_run = await self.db.read(self._get_meta, "last_decay_at")
+        last_run = datetime.fromisoformat(last_run) if last_run else None
+        idle_before = (now - timedelta(days=min_idle_days)).isoformat()
+        
+        def select(conn, after):
+            cursor = conn.execute(
+                '''
+                SELECT rowid, memory_id, importance, last_accessed, access_count FROM memories
+                WHERE rowid > ? AND last_accessed < ? AND importance > 0
+                ORDER BY rowid LIMIT ?
+                ''',
+                (after, idle_before, batch_size)
+            )
+            return cursor.fetchall()
+        
+        def update(conn, rows):
+            conn.executemany('UPDATE memories SET importance = ? WHERE memory_id = ?', rows)
+        
+        decayed = 0
+        last_rowid = 0
+        while True:
+            rows = await self.db.read(select, last_rowid)
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+            
+            updates = []
+            for _, memory_id, importance, last_accessed, access_count in rows:
+                idle_since = datetime.fromisoformat(last_accessed)
+                if last_run is not None and last_run > idle_since:
+                    idle_since = last_run
+                idle_days = (now - idle_since).total_seconds() / 86400.0
+                if idle_days <= 0:
+                    continue
+                half_life = half_life_days * (1.0 + math.log1p(access_count))
+                updates.append((importance * 0.5 ** (idle_days / half_life), memory_id))
+            
+            if updates:
+                await self.db.write(update, updates)
+                self._invalidate_queries()
+                decayed += len(updates)
+        
+        await self.db.write(self._set_meta, "last_decay_at", now.isoformat())
+        logger.info(f"Decayed importance of {decayed} memories")
+        return decayed
+    
+    async def evict(self, min_importance: float = 0.05, max_memories: int = None,
+                   archive: bool = True) -> int:
+        """
+        Remove memories below an importance threshold or over a size budget
+        
+        Args:
+            min_importance: Memories with lower importance are evicted
+            max_memories: Keep at most this many memories, evicting the least
+                important (then least recently accessed) first
+            archive: Move evicted memories to memories_archive instead of deleting them
+            
+        Returns:
+            Number of memories evicted
+        """
+        await self._access_stats.flush()
+        
+        def select(conn):
+            ids = [row[0] for row in conn.execute(
+                'SELECT memory_id FROM memories WHERE importance < ?', (min_importance,)
+            )]
+            if max_memories is not None:
+                total = conn.execute('SELECT COUNT(*) FROM memories').fetchone()[0]
+                excess = total - len(ids) - max_memories
+                if excess > 0:
+                    ids.extend(row[0] for row in conn.execute(
+                        '''
+                        SELECT memory_id FROM memories WHERE importance >= ?
+                        ORDER BY importance ASC, last_accessed ASC LIMIT ?
+                        ''',
+                        (min_importance, excess)
+                    ))
+            return ids
+        
+        memory_ids = await self.db.read(select)
+        for start in range(0, len(memory_ids), 500):
+            await self.db.write(self._evict_batch, memory_ids[start:start + 500], archive)
+        self._index_remove(memory_ids)
+        if memory_ids:
+            self._invalidate_queries()
+        
+        logger.info(f"Evicted {len(memory_ids)} memories")
+        return len(memory_ids)
+    
+    def _evict_batch(self, conn: sqlite3.Connection, memory_ids: List[str], archive: bool):
+        """Archive (optionally) and delete one batch of memories"""
+        placeholders = ",".join("?" * len(memory_ids))
+        if archive:
+            archived_at = datetime.now().isoformat()
+            rows = conn.execute(
+                f'''
+                SELECT memory_id, content, metadata, embedding, created_at, last_accessed, 
+                       access_count, importance, embedding_offset
+                FROM memories WHERE memory_id IN ({placeholders})
+                ''',
+                memory_ids
+            ).fetchall()
+            archived = []
+            for row in rows:
+                embedding = row[3]
+                if embedding is None and row[8] is not None and self._sidecar is not None:
+                    # Sidecar rows are reclaimed by compaction, so archive a copy
+                    embedding = encode_embedding(self._sidecar.read(row[8]), self.embedding_dtype)
+                archived.append(row[:3] + (embedding,) + row[4:8] + (archived_at,))
+            conn.executemany(
+                '''
+                INSERT OR REPLACE INTO memories_archive 
+                (memory_id, content, metadata, embedding, created_at, last_accessed, 
+                 access_count, importance, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                archived
+            )
+        conn.execute(f'DELETE FROM memories WHERE memory_id IN ({placeholders})', memory_ids)
+    
+    async def optimize_storage(self, vacuum_pages: int = 1000) -> int:
+        """
+        Reclaim free pages incrementally and refresh query-planner statistics
+        
+        Args:
+            vacuum_pages: Maximum free pages returned to the file system
+            
+        Returns:
+            Number of free pages left in the database
+        """
+        def optimize(conn):
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                conn.execute(f'PRAGMA incremental_vacuum({int(vacuum_pages)})').fetchall()
+            # Bounded, approximate ANALYZE of tables whose statistics are stale
+            conn.execute('PRAGMA analysis_limit = 400')
+            conn.execute('PRAGMA optimize')
+            return conn.execute('PRAGMA freelist_count').fetchone()[0]
+        
+        return await self.db.run_exclusive(optimize)
+    
+    async def run_maintenance(self, half_life_days: float = 30.0, 
+                             min_importance: float = 0.05, max_memories: int = None,
+                             archive: bool = True, vacuum_pages: int = 1000) -> Dict[str, int]:
+        """
+        Run one maintenance pass: decay, eviction, sidecar compaction and storage optimization
+        
+        Returns:
+            Counts of the work done by each step
+        """
+        decayed = await self.decay_importance(half_life_days)
+        evicted = await self.evict(min_importance, max_memories, archive)
+        reclaimed = await self.compact_embeddings() if evicted else 0
+        free_pages = await self.optimize_storage(vacuum_pages)
+        # Clears floating-point drift in the incrementally maintained importance sum
+        await self.db.write(lambda conn: self._rebuild_aggregates(conn.cursor()))
+        return {
+            "decayed": decayed,
+            "evicted": evicted,
+            "sidecar_rows_reclaimed": reclaimed,
+            "free_pages": free_pages
+        }
+    
+    def start_maintenance(self, interval: float = 3600.0, **options):
+        """
+        Run maintenance in the background every `interval` seconds
+        
+        Args:
+            interval: Seconds between maintenance passes
+            **options: Arguments passed to run_maintenance
+        """
+        if self._maintenance_task is not None and not self._maintenance_task.done():
+            return
+        
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    result = await self.run_maintenance(**options)
+                    logger.info(f"Memory maintenance finished: {result}")
+                except Exception as e:
+                    logger.error(f"Memory maintenance failed: {str(e)}")
+        
+        self._maintenance_task = asyncio.get_running_loop().create_task(loop())
+    
+    async def stop_maintenance(self):
+        """Stop the background maintenance task"""
+        if self._maintenance_task is None:
+            return
+        self._maintenance_task.cancel()
+        try:
+            await self._maintenance_task
+        except asyncio.CancelledError:
+            pass
+        self._maintenance_task = None
+    
+    @staticmethod
+    def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute('SELECT value FROM memory_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+        conn.execute('INSERT OR REPLACE INTO memory_meta (key, value) VALUES (?, ?)', (key, value))
+    
+    async def export(self, path: str, chunk_size: int = 10000, compress: bool = False) -> int:
+        """
+        Stream every memory to a directory of columnar NumPy shards
+        
+        Rows are read in memory ID order, chunk_size at a time, and each chunk
+        is written as one .npz file: strings as UTF-8 buffers with offsets,
+        numbers as typed arrays and embeddings as a matrix of the type they
+        are stored in (float32 for int8 storage), so nothing is lost on
+        import. A manifest.json is written last and marks the export as
+        complete.
+        
+        Args:
+            path: Directory to write, which must not already hold an export
+            chunk_size: Memories per shard file
+            compress: Deflate the shard files (smaller, but CPU-bound)
+            
+        Returns:
+            Number of memories exported
+        """
+        manifest_path = os.path.join(path, "manifest.json")
+        if os.path.exists(manifest_path):
+            raise FileExistsError(f"{path} already holds an export")
+        os.makedirs(path, exist_ok=True)
+        
+        def select(conn, after):
+            compactions = self._compactions
+            rows = conn.execute(
+                '''
+                SELECT memory_id, content, metadata, embedding, created_at, last_accessed,
+                       access_count, importance, embedding_offset
+                FROM memories WHERE memory_id > ? ORDER BY memory_id LIMIT ?
+                ''',
+                (after, max(1, chunk_size))
+            ).fetchall()
+            return self._read_sidecar_rows(conn, rows, compactions)
+        
+        loop = asyncio.get_running_loop()
+        parts: List[str] = []
+        dtypes: List[np.dtype] = []
+        total = 0
+        after = ""
+        while True:
+            rows = await self.db.read(select, after)
+            if not rows:
+                break
+            part = f"part-{len(parts):05d}.npz"
+            dtypes.append(await loop.run_in_executor(None, self._write_export_part, 
+                                                     os.path.join(path, part), rows, compress))
+            parts.append(part)
+            total += len(rows)
+            after = rows[-1][0]
+        
+        manifest = {
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "dimension": self.vector_dimension,
+            # The widest embedding column over all parts
+            "embedding_dtype": np.result_type(*dtypes).name if dtypes else "float32",
+            "count": total,
+            "parts": parts,
+            "exported_at": datetime.now().isoformat()
+        }
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        
+        logger.info(f"Exported {total} memories to {path} in {len(parts)} parts")
+        return total
+    
+    def _write_export_part(self, file_path: str, rows: List[tuple], compress: bool) -> np.dtype:
+        """
+        Convert one chunk of rows to columns and write it as an .npz file
+        
+        Returns:
+            Type of the embedding column: the widest type the chunk's
+            embeddings are stored in (float32 for int8)
+        """
+        count = len(rows)
+        # Sidecar embeddings were copied into the rows when they were read
+        stored = {row[3].dtype.name if isinstance(row[3], np.ndarray) else embedding_blob_dtype(row[3])
+                  for row in rows if row[3] is not None}
+        stored = ["float64" if dtype == "legacy" else "float32" if dtype == "int8" else dtype 
+                  for dtype in stored]
+        dtype = np.result_type(*stored) if stored else np.dtype(np.float32)
+        
+        embeddings = np.zeros((count, self.vector_dimension), dtype=dtype)
+        has_embedding = np.zeros(count, dtype=bool)
+        for i, row in enumerate(rows):
+            if row[3] is None:
+                continue
+            vector = row[3] if isinstance(row[3], np.ndarray) else decode_embedding(row[3])
+            if vector.shape[0] == self.vector_dimension:
+                embeddings[i] = vector
+                has_embedding[i] = True
+            else:
+                logger.warning(f"Not exporting embedding of memory {row[0]}: "
+                               f"dimension {vector.shape[0]}")
+        
+        columns: Dict[str, np.ndarray] = {}
+        for position, name in ((0, "memory_id"), (1, "content"), (2, "metadata"),
+                               (4, "created_at"), (5, "last_accessed")):
+            columns[f"{name}_data"], columns[f"{name}_offsets"] = \
+                _pack_strings([row[position] for row in rows])
+        columns["access_count"] = np.asarray([row[6] for row in rows], dtype=np.int64)
+        columns["importance"] = np.asarray([row[7] for row in rows], dtype=np.float64)
+        columns["embedding"] = embeddings
+        columns["has_embedding"] = has_embedding
+        
+        save = np.savez_compressed if compress else np.savez
+        with open(file_path, "wb") as f:
+            save(f, **columns)
+        return dtype
+    
+    async def import_(self, path: str) -> int:
+        """
+        Load memories from a directory written by export
+        
+        Memories are restored as exported, including their IDs, statistics
+        and timestamps; IDs that already exist are skipped. Each shard file
+        is inserted in one transaction, so memory use stays bounded.
+        
+        Args:
+            path: Export directory
+            
+        Returns:
+            Number of memories imported
+        """
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != EXPORT_FORMAT or manifest.get("version") != EXPORT_VERSION:
+            raise ValueError(f"{path} is not a supported memory export")
+        if manifest["dimension"] != self.vector_dimension:
+            raise ValueError(f"Export holds {manifest['dimension']}-dimensional embeddings, "
+                             f"expected {self.vector_dimension}")
+        
+        def write(conn, memories):
+            existing = set()
+            for start in range(0, len(memories), 500):
+                chunk = [memory.memory_id for memory in memories[start:start + 500]]
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(row[0] for row in conn.execute(
+                    f'SELECT memory_id FROM memories WHERE memory_id IN ({placeholders})', chunk
+                ))
+            fresh = [memory for memory in memories if memory.memory_id not in existing]
+            return fresh, self._insert_memories(conn, fresh)
+        
+        loop = asyncio.get_running_loop()
+        total = 0
+        for part in manifest["parts"]:
+            memories = await loop.run_in_executor(None, self._read_export_part, 
+                                                  os.path.join(path, part))
+            fresh, offsets = await self.db.write(write, memories)
+            self._index_add(*fresh, offsets=offsets)
+            self._invalidate_queries()
+            total += len(fresh)
+        
+        logger.info(f"Imported {total} memories from {path}")
+        return total
+    
+    @staticmethod
+    def _read_export_part(file_path: str) -> List[Memory]:
+        """Read one .npz shard file back into memories"""
+        with np.load(file_path, allow_pickle=False) as columns:
+            strings = {
+                name: _unpack_strings(columns[f"{name}_data"], columns[f"{name}_offsets"])
+                for name in ("memory_id", "content", "metadata", "created_at", "last_accessed")
+            }
+            access_counts = columns["access_count"].tolist()
+            importances = columns["importance"].tolist()
+            embeddings = columns["embedding"]
+            if embeddings.dtype == np.float16:
+                embeddings = embeddings.astype(np.float32)
+            has_embedding = columns["has_embedding"]
+        
+        memories = []
+        for i, memory_id in enumerate(strings["memory_id"]):
+            memory = Memory(strings["content"][i], json.loads(strings["metadata"][i]),
+                            embeddings[i] if has_embedding[i] else None, memory_id)
+            memory.created_at = datetime.fromisoformat(strings["created_at"][i])
+            memory.last_accessed = datetime.fromisoformat(strings["last_accessed"][i])
+            memory.access_count = access_counts[i]
+            memory.importance = importances[i]
+            memories.append(memory)
+        return memories
+    
     async def get_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the memory system
@@ -380,16 +2482,19 @@ class MemorySystem:
         Returns:
             Dictionary of statistics
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Make buffered access counts visible to the statistics queries
+        await self._access_stats.flush()
         
-        # Total memories
-        cursor.execute('SELECT COUNT(*) FROM memories')
-        total_memories = cursor.fetchone()[0]
+        return await self.db.read(self._collect_stats)
+    
+    def _collect_stats(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """Run the statistics queries on a reader connection"""
+        cursor = conn.cursor()
         
-        # Average importance
-        cursor.execute('SELECT AVG(importance) FROM memories')
-        avg_importance = cursor.fetchone()[0] or 0
+        # Total memories and average importance, from the maintained aggregates
+        cursor.execute('SELECT total, importance_sum FROM memory_stats WHERE id = 1')
+        total_memories, importance_sum = cursor.fetchone() or (0, 0.0)
+        avg_importance = importance_sum / total_memories if total_memories else 0
         
         # Most accessed memories
         cursor.execute(
@@ -414,12 +2519,10 @@ class MemorySystem:
         
         # Tag statistics
         cursor.execute(
-            'SELECT tag, COUNT(*) FROM memory_tags GROUP BY tag ORDER BY COUNT(*) DESC LIMIT 10'
+            'SELECT tag, count FROM memory_tag_counts ORDER BY count DESC LIMIT 10'
         )
         top_tags = [{"tag": row[0], "count": row[1]} for row in cursor.fetchall()]
         
-        conn.close()
-        
         return {
             "total_memories": total_memories,
             "average_importance": avg_importance,
@@ -429,32 +2532,17 @@ class MemorySystem:
             "top_tags": top_tags
         }
     
-    async def _update_access(self, memory_id: str):
-        """Update access statistics for a memory"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
-        
-        cursor.execute(
-            'UPDATE memories SET last_accessed = ?, access_count = access_count + 1 WHERE memory_id = ?',
-            (now, memory_id)
-        )
-        
-        conn.commit()
-        conn.close()
+    async def _update_access(self, *memory_ids: str):
+        """Record accesses to memories (written to the database in batches)"""
+        await self._access_stats.record(list(memory_ids))
     
     async def _generate_embedding(self, text: str) -> np.ndarray:
-        """
-        Generate an embedding vector for text
-        
-        In a real implementation, this would call a language model.
-        Here we use a simple placeholder implementation.
-        """
-        # Placeholder: Generate a random vector
-        # In a real implementation, this would call a language model API
-        np.random.seed(hash(text) % 2**32)
-        return np.random.randn(self.vector_dimension)
+        """Generate an embedding vector for text using the embedding provider"""
+        return await self.embedder.embed(text)
+    
+    async def _generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """Generate embedding vectors for a batch of texts in one provider call"""
+        return await self.embedder.embed_many(texts)
     
     def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -464,32 +2552,424 @@ class MemorySystem:
         return dot_product / (norm1 * norm2)
     
     def _row_to_memory(self, row) -> Memory:
-        """Convert a database row to a Memory object"""
+        """
+        Convert a database row to a Memory object
+        
+        Metadata, embedding and timestamps are decoded when first accessed.
+        
+        Args:
+            row: Row in the standard memories column order
+            
+        Returns:
+            The memory
+        """
         columns = [
             "memory_id", "content", "metadata", "embedding", 
-            "created_at", "last_accessed", "access_count", "importance"
+            "created_at", "last_accessed", "access_count", "importance",
+            "embedding_offset", "fts_rowid"
         ]
         row_dict = dict(zip(columns, row))
         
-        # Parse metadata
-        metadata = json.loads(row_dict["metadata"])
+        memory = LazyMemory(
+            row_dict["memory_id"], row_dict["content"],
+            row_dict["access_count"], row_dict["importance"],
+            row_dict["metadata"], 
+            # Sidecar embeddings arrive already read, see _read_sidecar_rows
+            None if isinstance(row_dict["embedding"], np.ndarray) else row_dict["embedding"],
+            row_dict["created_at"], row_dict["last_accessed"]
+        )
+        if isinstance(row_dict["embedding"], np.ndarray):
+            embedding = row_dict["embedding"]
+            memory.embedding = embedding.astype(np.float32) if embedding.dtype == np.float16 \
+                else embedding
+        return memory
+
+class ShardedMemorySystem:
+    """
+    Memory system partitioned across several SQLite files
+    
+    Every shard is a full MemorySystem with its own writer connection, so
+    writes to different shards proceed in parallel. Memories are placed by
+    a hash of their ID, or of a metadata value such as the agent when
+    partition_key is set. Searches fan out to all shards, score on a shared
+    thread pool and merge the per-shard top results.
+    """
+    
+    def __init__(self, db_dir: str = "data/memory", shards: int = 4,
+                partition_key: str = None, vector_dimension: int = 768,
+                embedding_provider: EmbeddingProvider = None, **options):
+        """
+        Initialize the sharded memory system
         
-        # Parse embedding
-        embedding = None
-        if row_dict["embedding"]:
-            embedding = np.frombuffer(row_dict["embedding"], dtype=np.float64)
+        Args:
+            db_dir: Directory holding one database file per shard
+            shards: Number of shards; fixed for the lifetime of the store
+            partition_key: Metadata key whose value selects the shard (the first
+                element for list values such as "tags"); memories without it,
+                and the default None, are placed by a hash of their ID
+            vector_dimension: Dimension of the embedding vectors
+            embedding_provider: Provider shared by all shards
+            **options: Further MemorySystem arguments applied to every shard
+        """
+        if shards < 1:
+            raise ValueError("A sharded memory system needs at least one shard")
         
-        # Create memory
-        memory = Memory(
-            content=row_dict["content"],
-            metadata=metadata,
-            embedding=embedding,
-            memory_id=row_dict["memory_id"]
+        self.db_dir = db_dir
+        self.partition_key = partition_key
+        self.vector_dimension = vector_dimension
+        self.embedder = embedding_provider or CachedEmbeddingProvider(
+            HashingEmbeddingProvider(vector_dimension)
         )
         
-        memory.created_at = datetime.fromisoformat(row_dict["created_at"])
-        memory.last_accessed = datetime.fromisoformat(row_dict["last_accessed"])
-        memory.access_count = row_dict["access_count"]
-        memory.importance = row_dict["importance"]
+        # Vector scoring for every shard runs here, in parallel
+        self.executor = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="memory-shard")
+        
+        self.shards: List[MemorySystem] = []
+        try:
+            for number in range(shards):
+                shard = MemorySystem(
+                    os.path.join(db_dir, f"shard-{number:03d}.db"),
+                    vector_dimension=vector_dimension,
+                    embedding_provider=self.embedder,
+                    search_executor=self.executor,
+                    **options
+                )
+                self.shards.append(shard)
+                self._check_layout(shard, number, shards)
+        except Exception:
+            for shard in self.shards:
+                shard.db.close()
+            self.executor.shutdown(wait=False)
+            raise
+        
+        logger.info(f"Sharded memory system initialized with {shards} shards in {db_dir}")
+    
+    def _check_layout(self, shard: MemorySystem, number: int, shards: int):
+        """Record the shard layout, refusing to open a store sharded differently"""
+        layout = json.dumps({"shard": number, "shards": shards, 
+                             "partition_key": self.partition_key})
+        with shard.db.transaction() as conn:
+            stored = shard._get_meta(conn, "shard_layout")
+            if stored is None:
+                shard._set_meta(conn, "shard_layout", layout)
+            elif stored != layout:
+                raise ValueError(f"{shard.db_path} was created with layout {stored}, "
+                                 f"not {layout}")
+    
+    async def close(self):
+        """Close every shard and the shared thread pool"""
+        for shard in self.shards:
+            await shard.close()
+        self.executor.shutdown(wait=True)
+    
+    async def __aenter__(self) -> 'ShardedMemorySystem':
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    def _hash_shard(self, key: str) -> int:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % len(self.shards)
+    
+    def _shard_for(self, memory_id: str, metadata: Dict[str, Any]) -> int:
+        """Pick the number of the shard a new memory is written to"""
+        if self.partition_key is not None:
+            value = (metadata or {}).get(self.partition_key)
+            if isinstance(value, (list, tuple)):
+                value = value[0] if value else None
+            if value is not None:
+                return self._hash_shard(f"{self.partition_key}:{value}")
+        return self._hash_shard(memory_id)
+    
+    def _shards_holding(self, memory_id: str) -> List[MemorySystem]:
+        """Shards that may hold a memory, given only its ID"""
+        if self.partition_key is None:
+            return [self.shards[self._hash_shard(memory_id)]]
+        return self.shards
+    
+    async def store(self, content: str, metadata: Dict[str, Any] = None, 
+                   embedding: np.ndarray = None, importance: float = None) -> Memory:
+        """
+        Store a new memory in its shard
         
-        return memory
+        Args:
+            content: The content to remember
+            metadata: Additional metadata about the memory
+            embedding: Vector embedding of the content
+            importance: Importance score (0-1)
+            
+        Returns:
+            The stored memory
+        """
+        memory_id = new_memory_id()
+        shard = self.shards[self._shard_for(memory_id, metadata)]
+        return await shard.store(content, metadata, embedding, importance, memory_id=memory_id)
+    
+    async def store_many(self, items: Union[Iterable[Any], AsyncIterable[Any]], 
+                        batch_size: int = 256, 
+                        return_memories: bool = True) -> List[Memory]:
+        """
+        Store many memories, writing each batch to all shards in parallel
+        
+        Items take the same forms as MemorySystem.store_many.
+        
+        Args:
+            items: Iterable or async iterable of items to store
+            batch_size: Number of items split across the shards per round
+            return_memories: Keep and return the stored memories
+            
+        Returns:
+            The stored memories (empty when return_memories is False)
+        """
+        batch_size = max(1, batch_size)
+        stored: List[Memory] = []
+        batch: List[Any] = []
+        
+        async def flush(batch):
+            groups: Dict[int, List[Dict[str, Any]]] = {}
+            for item in batch:
+                item = {"content": item} if isinstance(item, str) else dict(item)
+                item.setdefault("memory_id", new_memory_id())
+                number = self._shard_for(item["memory_id"], item.get("metadata"))
+                groups.setdefault(number, []).append(item)
+            results = await asyncio.gather(*[
+                self.shards[number]._store_batch(group) for number, group in groups.items()
+            ])
+            if return_memories:
+                for memories in results:
+                    stored.extend(memories)
+        
+        async for item in MemorySystem._iterate(items):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+        
+        return stored
+    
+    async def retrieve(self, memory_id: str) -> Optional[Memory]:
+        """
+        Retrieve a specific memory by ID
+        
+        Args:
+            memory_id: ID of the memory to retrieve
+            
+        Returns:
+            The memory if found, None otherwise
+        """
+        results = await asyncio.gather(*[
+            shard.retrieve(memory_id) for shard in self._shards_holding(memory_id)
+        ])
+        return next((memory for memory in results if memory is not None), None)
+    
+    async def search(self, query: str, limit: int = 5, mode: str = None,
+                    tags_any: List[str] = None, tags_all: List[str] = None,
+                    created_after: Union[datetime, str] = None, 
+                    created_before: Union[datetime, str] = None,
+                    min_importance: float = None, 
+                    metadata: Dict[str, Any] = None) -> List[Memory]:
+        """
+        Search every shard in parallel and merge the top results
+        
+        Arguments are the same as MemorySystem.search.
+        
+        Returns:
+            List of matching memories
+        """
+        first = self.shards[0]
+        mode = mode or first.search_mode
+        if mode not in ("ann", "exact"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        
+        where, params = first._filter_clause(tags_any, tags_all, created_after, 
+                                             created_before, min_importance, metadata)
+        
+        # Embed once and share the vector with every shard
+        query_embedding = await self.embedder.embed(query)
+        
+        results = await asyncio.gather(*[
+            shard._search_scored(query_embedding, limit, mode, where, params)
+            for shard in self.shards
+        ])
+        
+        merged = sorted(
+            ((score, number, memory) for number, scored in enumerate(results) 
+             for memory, score in scored),
+            key=lambda entry: entry[0], reverse=True
+        )[:limit]
+        
+        # Update access stats on the shards the top results came from
+        accessed: Dict[int, List[str]] = {}
+        for _, number, memory in merged:
+            accessed.setdefault(number, []).append(memory.memory_id)
+        await asyncio.gather(*[
+            self.shards[number]._update_access(*memory_ids) 
+            for number, memory_ids in accessed.items()
+        ])
+        
+        return [memory for _, _, memory in merged]
+    
+    async def search_by_tag(self, tag: str, limit: int = 10) -> List[Memory]:
+        """
+        Search for memories by tag across all shards
+        
+        Args:
+            tag: Tag to search for
+            limit: Maximum number of results to return
+            
+        Returns:
+            List of matching memories
+        """
+        results = await asyncio.gather(*[shard.search_by_tag(tag, limit) for shard in self.shards])
+        memories = [memory for memories in results for memory in memories]
+        memories.sort(key=lambda memory: (memory.importance, memory.last_accessed), reverse=True)
+        return memories[:limit]
+    
+    async def update_importance(self, memory_id: str, importance: float) -> bool:
+        """
+        Update the importance score of a memory
+        
+        Args:
+            memory_id: ID of the memory to update
+            importance: New importance score (0-1)
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        results = await asyncio.gather(*[
+            shard.update_importance(memory_id, importance) 
+            for shard in self._shards_holding(memory_id)
+        ])
+        return any(results)
+    
+    async def forget(self, memory_id: str) -> bool:
+        """
+        Delete a memory
+        
+        Args:
+            memory_id: ID of the memory to delete
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        results = await asyncio.gather(*[
+            shard.forget(memory_id) for shard in self._shards_holding(memory_id)
+        ])
+        return any(results)
+    
+    async def run_maintenance(self, **options) -> Dict[str, int]:
+        """
+        Run one maintenance pass on every shard
+        
+        Args:
+            **options: Arguments passed to MemorySystem.run_maintenance
+            
+        Returns:
+            Counts of the work done by each step, summed over the shards
+        """
+        results = await asyncio.gather(*[shard.run_maintenance(**options) for shard in self.shards])
+        totals: Dict[str, int] = {}
+        for result in results:
+            for key, value in result.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about the memory system, combined over all shards
+        
+        Returns:
+            Dictionary of statistics
+        """
+        results = await asyncio.gather(*[shard.get_stats() for shard in self.shards])
+        tag_counts = await asyncio.gather(*[
+            shard.db.read(lambda conn: conn.execute(
+                'SELECT tag, count FROM memory_tag_counts'
+            ).fetchall())
+            for shard in self.shards
+        ])
+        
+        total_memories = sum(stats["total_memories"] for stats in results)
+        importance_sum = sum(stats["average_importance"] * stats["total_memories"] 
+                             for stats in results)
+        
+        def top(key: str, field: str) -> List[Dict[str, Any]]:
+            entries = [entry for stats in results for entry in stats[key]]
+            return sorted(entries, key=lambda entry: entry[field], reverse=True)[:5]
+        
+        tags: Dict[str, int] = {}
+        for rows in tag_counts:
+            for tag, count in rows:
+                tags[tag] = tags.get(tag, 0) + count
+        top_tags = sorted(tags.items(), key=lambda item: item[1], reverse=True)[:10]
+        
+        return {
+            "total_memories": total_memories,
+            "average_importance": importance_sum / total_memories if total_memories else 0,
+            "most_accessed": top("most_accessed", "access_count"),
+            "most_important": top("most_important", "importance"),
+            "most_recent": top("most_recent", "created_at"),
+            "top_tags": [{"tag": tag, "count": count} for tag, count in top_tags],
+            "shards": len(self.shards)
+        }
+
+def main():
+    """Command-line maintenance for memory databases"""
+    parser = argparse.ArgumentParser(description="SoulCore memory system maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    migrate = subparsers.add_parser("migrate", help="Rewrite stored embeddings in a new storage type")
+    migrate.add_argument("--db", default="data/memory.db", help="Path to the memory database")
+    migrate.add_argument("--dtype", default="float32", choices=sorted(EMBEDDING_DTYPES),
+                         help="Target embedding storage type")
+    migrate.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    migrate.add_argument("--no-vacuum", action="store_true", help="Skip the final VACUUM")
+    
+    compact = subparsers.add_parser("compact", help="Reclaim space in the embedding sidecar file")
+    compact.add_argument("--db", default="data/memory.db", help="Path to the memory database")
+    compact.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    
+    export = subparsers.add_parser("export", help="Write all memories to a columnar export directory")
+    export.add_argument("--db", default="data/memory.db", help="Path to the memory database")
+    export.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    export.add_argument("--out", required=True, help="Export directory to create")
+    export.add_argument("--chunk-size", type=int, default=10000, help="Memories per shard file")
+    export.add_argument("--compress", action="store_true", help="Deflate the shard files")
+    
+    import_ = subparsers.add_parser("import", help="Load memories from an export directory")
+    import_.add_argument("--db", default="data/memory.db", help="Path to the memory database")
+    import_.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    import_.add_argument("--src", required=True, help="Export directory to read")
+    args = parser.parse_args()
+    
+    async def run():
+        if args.command == "migrate":
+            async with MemorySystem(args.db, vector_dimension=args.dimension, index=None,
+                                    embedding_dtype=args.dtype) as memory:
+                rewritten = await memory.migrate_embeddings(vacuum=not args.no_vacuum)
+                print(f"Rewrote {rewritten} embeddings as {args.dtype}")
+        elif args.command == "compact":
+            async with MemorySystem(args.db, vector_dimension=args.dimension, index=None,
+                                    embedding_storage="sidecar") as memory:
+                reclaimed = await memory.compact_embeddings()
+                print(f"Reclaimed {reclaimed} sidecar rows")
+        elif args.command == "export":
+            async with MemorySystem(args.db, vector_dimension=args.dimension, index=None) as memory:
+                exported = await memory.export(args.out, args.chunk_size, args.compress)
+                print(f"Exported {exported} memories to {args.out}")
+        elif args.command == "import":
+            async with MemorySystem(args.db, vector_dimension=args.dimension, index=None) as memory:
+                imported = await memory.import_(args.src)
+                print(f"Imported {imported} memories from {args.src}")
+    
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        logger.error(f"Memory maintenance failed: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
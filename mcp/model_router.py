@@ -3,10 +3,18 @@ Model Router for SoulCoreHub
 Automatically routes requests to specialized models based on intent detection
 """
 
+import asyncio
+import hashlib
 import re
-from typing import Dict, List, Any, Optional
+import time
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncGenerator, Callable, Dict, FrozenSet, Iterable, List, Any, Optional, Tuple
 import json
 import logging
+import numpy as np
+
+from mcp.embedding_provider import HashingEmbeddingProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +28,27 @@ class BaseModel:
     async def generate_response(self, user_input: str, parameters: Dict[str, Any] = None) -> Dict[str, Any]:
         """Generate a response based on user input"""
         raise NotImplementedError("Subclasses must implement this method")
+    
+    async def stream_response(self, user_input: str, 
+                             parameters: Dict[str, Any] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream a response as it is generated
+        
+        Models that generate incrementally override this to yield a chunk per
+        token as it is produced, ending with a chunk where "done" is True that
+        carries the complete response. This default runs generate_response
+        and yields the whole response as that single final chunk.
+        
+        Args:
+            user_input: The user's input text
+            parameters: Additional parameters for the model
+            
+        Yields:
+            Chunks with "model_used", "delta" (the new text) and "done"; the
+            final chunk also has every field of the complete response
+        """
+        response = await self.generate_response(user_input, parameters)
+        yield dict(response, delta=response.get("response", ""), done=True)
 
 class SummarizerModel(BaseModel):
     """Model specialized for summarization tasks"""
@@ -85,10 +114,539 @@ class DefaultModel(BaseModel):
             "confidence": 0.85
         }
 
+class ModelOverloadedError(Exception):
+    """Exception for requests a model could not accept within its queue limits"""
+    def __init__(self, message: str, model_name: str = None, reason: str = None):
+        super().__init__(message)
+        self.model_name = model_name
+        # "queue_full" or "queue_timeout"
+        self.reason = reason
+
+class ModelLimiter:
+    """
+    Bounds the concurrent generations of one model
+    
+    Up to max_concurrency requests run at once; up to max_queue more wait
+    for a slot, in arrival order. Beyond that, requests are rejected
+    immediately, and a request that waits longer than queue_timeout gives
+    up. Queue depth and wait times are kept for metrics.
+    """
+    
+    def __init__(self, name: str, max_concurrency: int = 4, max_queue: int = 64,
+                queue_timeout: Optional[float] = 30.0, wait_samples: int = 1024):
+        """
+        Initialize the limiter
+        
+        Args:
+            name: Name of the limited model
+            max_concurrency: Generations allowed to run at once
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Seconds a request may wait (None waits indefinitely)
+            wait_samples: Recent wait times kept for percentiles
+        """
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._wait_times: deque = deque(maxlen=max(1, wait_samples))
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for and hold a generation slot"""
+        # Admission is counted here rather than read off the semaphore: with a
+        # timeout, the acquire runs in its own task, so requests arriving in the
+        # same tick would all still see a free semaphore
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise ModelOverloadedError(f"Queue for model {self.name} is full",
+                                       self.name, "queue_full")
+        
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            if self.queue_timeout is None:
+                await self._semaphore.acquire()
+            else:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise ModelOverloadedError(
+                f"Request waited over {self.queue_timeout}s for model {self.name}",
+                self.name, "queue_timeout"
+            ) from None
+        finally:
+            self.waiting -= 1
+        self._wait_times.append(time.monotonic() - start)
+        
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get the limiter's current state and recent wait times
+        
+        Returns:
+            Queue depth, active generations, counters and wait times in milliseconds
+        """
+        waits = np.asarray(self._wait_times, dtype=np.float64) * 1000
+        return {
+            "queue_depth": self.waiting,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms_mean": float(waits.mean()) if waits.size else 0.0,
+            "wait_ms_p95": float(np.percentile(waits, 95)) if waits.size else 0.0,
+            "wait_ms_max": float(waits.max()) if waits.size else 0.0
+        }
+
+# Characters that make a pattern more than a plain keyword
+_REGEX_SYNTAX = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+class IntentMatcher:
+    """
+    Classifies text against all intent patterns in a single regex pass
+    
+    All patterns are joined into one compiled alternation and the lowercased
+    text is scanned once, resuming just after the start of each hit so that
+    overlapping matches are seen. Every hit is credited to each pattern that
+    matches at its position, by dictionary lookup for plain keywords and by
+    matching in the full text otherwise, so that anchors, word boundaries and
+    lookarounds keep their context. Regular expressions are found by
+    descending a binary tree of alternations over halves of them, so a hit
+    costs a few anchored matches per matching expression rather than one
+    per expression. The alternatives are deliberately
+    not capturing groups: those disable the regex engine's first-character
+    prefilter and make the scan an order of magnitude slower.
+    
+    Each distinct matched pattern adds its intent's weight to the intent's
+    score; the winner is the matched intent with the highest priority, then
+    the highest score, then the earliest position in intent_patterns.
+    """
+    
+    def __init__(self, intent_patterns: Dict[str, List[str]], 
+                weights: Dict[str, float] = None, priorities: Dict[str, int] = None):
+        """
+        Compile the matcher
+        
+        Args:
+            intent_patterns: Regex patterns per intent, in lowercase
+            weights: Score added per matched pattern of an intent (default 1.0)
+            priorities: Intents with a higher priority win whenever they match (default 0)
+        """
+        weights = weights or {}
+        priorities = priorities or {}
+        self.intents = list(intent_patterns)
+        self.weights = {intent: weights.get(intent, 1.0) for intent in self.intents}
+        self.priorities = {intent: priorities.get(intent, 0) for intent in self.intents}
+        
+        # Patterns in alternation order, as (intent, pattern)
+        self._patterns: List[Tuple[str, str]] = [
+            (intent, pattern) 
+            for intent, patterns in intent_patterns.items() 
+            for pattern in patterns
+        ]
+        # Plain keywords are attributed by lookup, the rest by matching at the hit
+        self._literals: Dict[str, List[int]] = {}
+        expressions: List[Tuple[int, str]] = []
+        for position, (_, pattern) in enumerate(self._patterns):
+            if not _REGEX_SYNTAX.search(pattern):
+                self._literals.setdefault(pattern, []).append(position)
+            else:
+                expressions.append((position, pattern))
+        self._expressions = self._expression_tree(expressions) if expressions else None
+        # Keywords by first character, the candidates for a hit at a position
+        self._by_initial: Dict[str, List[Tuple[str, List[int]]]] = {}
+        for literal, positions in self._literals.items():
+            self._by_initial.setdefault(literal[:1], []).append((literal, positions))
+        
+        self._regex = re.compile("|".join(f"(?:{pattern})" for _, pattern in self._patterns)) \
+            if self._patterns else None
+    
+    @classmethod
+    def _expression_tree(cls, expressions: List[Tuple[int, str]]) -> tuple:
+        """
+        Build (regex, position, children) nodes over (position, pattern) pairs
+        
+        A leaf is one pattern at its position; an inner node's regex is the
+        alternation of every pattern below it and matches where any does.
+        """
+        if len(expressions) == 1:
+            position, pattern = expressions[0]
+            return re.compile(pattern), position, ()
+        middle = len(expressions) // 2
+        regex = re.compile("|".join(f"(?:{pattern})" for _, pattern in expressions))
+        return regex, None, (cls._expression_tree(expressions[:middle]),
+                             cls._expression_tree(expressions[middle:]))
+    
+    def _identify(self, text: str, start: int) -> List[int]:
+        """Positions of every pattern that matches text at start"""
+        positions = []
+        for literal, literal_positions in self._by_initial.get(text[start:start + 1], ()):
+            if text.startswith(literal, start):
+                positions += literal_positions
+        nodes = [self._expressions] if self._expressions is not None else []
+        while nodes:
+            regex, position, children = nodes.pop()
+            if regex.match(text, start):
+                if children:
+                    nodes.extend(children)
+                else:
+                    positions.append(position)
+        if len(positions) > 1:
+            positions.sort()
+        return positions
+    
+    def _matched(self, text: str) -> Dict[str, List[str]]:
+        """Distinct matched patterns per intent, in order of first match"""
+        matched: Dict[str, List[str]] = {}
+        if self._regex is None:
+            return matched
+        text = text.lower()
+        seen = set()
+        start = 0
+        while start <= len(text):
+            match = self._regex.search(text, start)
+            if match is None:
+                break
+            for position in self._identify(text, match.start()):
+                if position not in seen:
+                    seen.add(position)
+                    intent, pattern = self._patterns[position]
+                    matched.setdefault(intent, []).append(pattern)
+            start = match.start() + 1
+        return matched
+    
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        Score every intent with at least one matching pattern
+        
+        Args:
+            text: The text to classify
+            
+        Returns:
+            Score per matched intent
+        """
+        return {intent: len(patterns) * self.weights[intent] 
+                for intent, patterns in self._matched(text).items()}
+    
+    def contenders(self, text: str) -> List[Tuple[str, List[str]]]:
+        """
+        Find the matched intents sharing the highest matched priority
+        
+        Args:
+            text: The text to classify
+            
+        Returns:
+            Each such intent with its matched patterns in order of first
+            match, the winner first and the rest by score, then pattern order
+        """
+        matched = self._matched(text)
+        if not matched:
+            return []
+        
+        top = max(self.priorities[intent] for intent in matched)
+        order = {intent: position for position, intent in enumerate(self.intents)}
+        ranked = sorted((intent for intent in matched if self.priorities[intent] == top),
+                        key=lambda intent: (-len(matched[intent]) * self.weights[intent], 
+                                            order[intent]))
+        return [(intent, matched[intent]) for intent in ranked]
+    
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """
+        Find the winning intent
+        
+        Args:
+            text: The text to classify
+            
+        Returns:
+            The intent and the first of its patterns that matched, or None
+        """
+        contenders = self.contenders(text)
+        if not contenders:
+            return None
+        intent, patterns = contenders[0]
+        return intent, patterns[0]
+
+# Example requests per intent, averaged into the semantic classifier's centroids.
+# "default" covers general questions that merely share words with a specialty.
+DEFAULT_INTENT_EXAMPLES = {
+    "summarize": [
+        "summarize this article for me", "give me a summary of the report",
+        "tldr of this thread", "what are the key points of this document",
+        "condense these meeting notes", "shorten this paragraph",
+        "a brief overview of the chapter", "the main ideas of this paper",
+        "recap the discussion in a few sentences", "the gist of this email",
+        "main takeaways from the transcript", "boil this down to bullet points"
+    ],
+    "code": [
+        "write a python function that sorts a list", "fix the bug in my javascript code",
+        "implement a binary search algorithm", "how do I call a rest api from node",
+        "refactor this class to use dependency injection", "write a sql query joining two tables",
+        "debug this stack trace", "create a bash script to rename files",
+        "what does this regex match", "write a unit test for this method",
+        "my java program throws a null pointer exception", "why does this loop never terminate",
+        "compile error in my c++ code", "build a react component with state",
+        "optimize this slow database query", "parse json in typescript",
+        "implement a linked list data structure", "the variable is undefined at runtime"
+    ],
+    "creative": [
+        "write a short story about a dragon", "compose a poem about the ocean",
+        "imagine a world where cats rule", "write song lyrics about summer",
+        "invent a backstory for a fictional character", "tell me a fairy tale",
+        "write a haiku about autumn", "brainstorm names for a fantasy kingdom",
+        "a limerick about a clumsy cat", "describe an imaginary city on another planet",
+        "write a bedtime story for my kids", "a sonnet about lost love",
+        "create a plot for a mystery novel", "a tale of a brave knight"
+    ],
+    "default": [
+        "what time is it in tokyo", "what should I study for my history class",
+        "how many students are in a typical class", "explain photosynthesis",
+        "what is the capital of france", "give me advice for a job interview",
+        "how do vaccines work", "recommend a good book to read",
+        "what did I miss in math class today", "how do I develop better sleep habits",
+        "who won the world cup", "how far away is the moon",
+        "a good recipe for dinner tonight", "what is the weather forecast",
+        "when does the chemistry class start", "tips for learning spanish"
+    ]
+}
+
+# Keywords common outside their intent ("class" at school, "program" at a
+# concert); in semantic mode a match on these alone defers to the classifier
+WEAK_PATTERNS = ("class", "develop", "program", "method")
+
+# Function words carry no intent but dominate short requests, so they are
+# dropped before embedding
+_STOPWORDS = frozenset(
+    "a an the this that these those is are was were be been am do does did "
+    "i me my you your we our it its of to in on for from with about as at by "
+    "and or but can could would should will please what how when who why "
+    "which there here some any all so just".split()
+)
+
+class SemanticIntentClassifier:
+    """
+    Classifies text by similarity to per-intent centroid vectors
+    
+    Texts are embedded with a local encoder and compared with every
+    centroid in one matrix product. Predictions whose best similarity or
+    lead over the runner-up is too small are reported as uncertain, so
+    the caller can fall back to keyword rules.
+    """
+    
+    def __init__(self, intent_examples: Dict[str, List[str]] = None,
+                encoder: Callable[[List[str]], np.ndarray] = None,
+                min_similarity: float = 0.1, min_margin: float = 0.02):
+        """
+        Initialize the classifier
+        
+        Args:
+            intent_examples: Example requests per intent (defaults to
+                DEFAULT_INTENT_EXAMPLES)
+            encoder: Function mapping texts to a matrix of embeddings (defaults
+                to a local hashing embedder)
+            min_similarity: Lowest cosine similarity to the best centroid that
+                counts as confident
+            min_margin: Lowest lead of the best centroid over the runner-up that
+                counts as confident
+        """
+        self.encoder = encoder or HashingEmbeddingProvider(dimension=512).encode
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.intents: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        # Bumped by every fit, so callers caching predictions can tell
+        self.version = 0
+        self.fit(intent_examples or DEFAULT_INTENT_EXAMPLES)
+    
+    def fit(self, intent_examples: Dict[str, List[str]]):
+        """
+        Recompute the centroids from example requests
+        
+        Args:
+            intent_examples: Example requests per intent
+        """
+        intents = [intent for intent, examples in intent_examples.items() if examples]
+        centroids = []
+        for intent in intents:
+            centroid = self._embed(intent_examples[intent]).mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) or 1.0))
+        self.intents = intents
+        self.centroids = np.stack(centroids).astype(np.float32) if centroids else None
+        self.version += 1
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        words = re.findall(r"\w+", text.lower())
+        return " ".join(word for word in words if word not in _STOPWORDS) or text.lower()
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.encoder([self._normalize(text) for text in texts]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    def predict_many(self, texts: List[str]) -> List[Tuple[Optional[str], float, float]]:
+        """
+        Score a batch of texts against every centroid with a single matrix product
+        
+        Args:
+            texts: The texts to classify
+            
+        Returns:
+            For each text, the closest intent (None without centroids), the
+            similarity to it and its lead over the runner-up
+        """
+        if not texts:
+            return []
+        if self.centroids is None:
+            return [(None, 0.0, 0.0)] * len(texts)
+        
+        similarities = self._embed(texts) @ self.centroids.T
+        best = np.argmax(similarities, axis=1)
+        best_scores = similarities[np.arange(len(texts)), best]
+        if len(self.intents) > 1:
+            runner_up = np.partition(similarities, -2, axis=1)[:, -2]
+        else:
+            runner_up = np.zeros(len(texts), dtype=np.float32)
+        
+        return [
+            (self.intents[index], float(score), float(margin))
+            for index, score, margin in zip(best.tolist(), best_scores.tolist(), 
+                                            (best_scores - runner_up).tolist())
+        ]
+    
+    def is_confident(self, similarity: float, margin: float) -> bool:
+        """Whether a prediction clears min_similarity and min_margin"""
+        return similarity >= self.min_similarity and margin >= self.min_margin
+    
+    def classify_many(self, texts: List[str]) -> List[Tuple[Optional[str], float]]:
+        """
+        Classify a batch of texts with a single matrix product
+        
+        Args:
+            texts: The texts to classify
+            
+        Returns:
+            For each text, the intent (None when not confident) and the
+            similarity to the best centroid
+        """
+        return [
+            (intent if self.is_confident(similarity, margin) else None, similarity)
+            for intent, similarity, margin in self.predict_many(texts)
+        ]
+    
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Classify a single text
+        
+        Args:
+            text: The text to classify
+            
+        Returns:
+            The intent (None when not confident) and its similarity
+        """
+        return self.classify_many([text])[0]
+
 class ModelRouter:
     """Routes requests to the appropriate specialized model based on intent"""
     
-    def __init__(self):
+    def __init__(self, intent_weights: Dict[str, float] = None, 
+                intent_priorities: Dict[str, int] = None,
+                intent_mode: str = "regex",
+                classifier: SemanticIntentClassifier = None,
+                weak_patterns: List[str] = None,
+                override_margin: float = 0.3,
+                intent_cache_size: int = 4096,
+                response_cache_size: int = 1024,
+                response_cache_ttl: float = 60.0,
+                coalesce_requests: bool = True,
+                max_concurrency: int = 4,
+                max_queue: int = 64,
+                queue_timeout: Optional[float] = 30.0,
+                model_limits: Dict[str, Dict[str, Any]] = None,
+                overload_policy: str = "error"):
+        """
+        Initialize the router
+        
+        Args:
+            intent_weights: Score added per matched pattern of an intent (default 1.0)
+            intent_priorities: Intents with a higher priority win whenever they match
+                (default 0; ties go to the higher score, then to pattern order)
+            intent_mode: "regex" to route on intent_patterns, or "semantic" to let
+                the embedding classifier decide, with the patterns as evidence
+                and as the fallback when it is not confident
+            classifier: Semantic classifier (built with the default examples on
+                first use when omitted)
+            weak_patterns: Generic keywords that on their own are too weak to
+                outweigh a confident classifier in semantic mode (defaults
+                to WEAK_PATTERNS)
+            override_margin: Lead over the runner-up the classifier needs to
+                overrule an intent matched by a specific keyword
+            intent_cache_size: Routing decisions kept in the LRU cache (0 disables it)
+            response_cache_size: Model responses kept in the response cache
+                (0 disables it)
+            response_cache_ttl: Seconds a cached response stays valid
+            coalesce_requests: Let concurrent identical requests share one
+                in-flight generation
+            max_concurrency: Generations each model may run at once
+            max_queue: Requests each model may hold waiting for a slot
+            queue_timeout: Seconds a request may wait for a slot (None for no limit)
+            model_limits: Per-model overrides of max_concurrency, max_queue and
+                queue_timeout, by model name
+            overload_policy: "error" to raise ModelOverloadedError when a model's
+                queue is full or a request times out in it, or "fallback" to
+                send the request to the default model instead
+        """
+        if overload_policy not in ("error", "fallback"):
+            raise ValueError(f"Unknown overload policy: {overload_policy}")
+        self.overload_policy = overload_policy
+        self.default_limits = {"max_concurrency": max_concurrency, "max_queue": max_queue,
+                               "queue_timeout": queue_timeout}
+        self.model_limits = dict(model_limits or {})
+        # Created per model name on first use
+        self.limiters: Dict[str, ModelLimiter] = {}
+        
+        # Routing decisions by hash of the normalized input, see _detect_intent
+        self.intent_cache_size = max(0, intent_cache_size)
+        self.intent_cache_hits = 0
+        self.intent_cache_misses = 0
+        self._intent_cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._classifier_version: Optional[int] = None
+        
+        # Responses by hash of (model, input, parameters), and the generations
+        # currently running for such keys, see route_request
+        self.response_cache_size = max(0, response_cache_size)
+        self.response_cache_ttl = response_cache_ttl
+        self.coalesce_requests = coalesce_requests
+        self.response_cache_hits = 0
+        self.response_cache_misses = 0
+        self.coalesced_requests = 0
+        self._response_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        
+        self._matcher: Optional[IntentMatcher] = None
+        # Configuration as last seen, see _check_routing
+        self._routing_fingerprint: Optional[int] = None
+        self._models_fingerprint: Optional[tuple] = None
+        self._classifier = classifier
+        self.intent_mode = intent_mode
+        self.weak_patterns = WEAK_PATTERNS if weak_patterns is None else weak_patterns
+        self.override_margin = override_margin
+        
         # Initialize specialized models
         self.models = {
             "summarizer": SummarizerModel(),
@@ -97,6 +655,16 @@ class ModelRouter:
             "default": DefaultModel()
         }
         
+        # Model that serves each intent, when not named after it
+        self.intent_models = {
+            "summarize": "summarizer",
+            "code": "coder",
+            "creative": "creative"
+        }
+        
+        self.intent_weights = intent_weights or {}
+        self.intent_priorities = intent_priorities or {}
+        
         # Define intent patterns for routing
         self.intent_patterns = {
             "summarize": [
@@ -105,16 +673,185 @@ class ModelRouter:
             ],
             "code": [
                 r"code", r"program", r"function", r"script", r"implement",
-                r"develop", r"class", r"method", r"algorithm", r"api"
+                r"develop", r"class", r"method", r"algorithm", r"\bapi",
+                r"python", r"java", r"debug", r"sql"
             ],
             "creative": [
-                r"story", r"poem", r"creative", r"imagine", r"fiction",
+                r"\bstor(?:y|ies)", r"poem", r"creative", r"imagine", r"fiction",
                 r"narrative", r"write .* story", r"compose", r"invent"
             ]
         }
         
         logger.info("ModelRouter initialized with specialized models")
     
+    # Whenever a pattern, weight, priority, model or mode changes, the compiled
+    # matcher is rebuilt and cached routing decisions are dropped: at once
+    # when an attribute is assigned, and on the next lookup when a dict or a
+    # pattern list is changed in place, see _check_routing
+    
+    @property
+    def intent_mode(self) -> str:
+        return self._intent_mode
+    
+    @intent_mode.setter
+    def intent_mode(self, mode: str):
+        if mode not in ("regex", "semantic"):
+            raise ValueError(f"Unknown intent mode: {mode}")
+        self._intent_mode = mode
+        self._routing_changed()
+    
+    @property
+    def weak_patterns(self) -> FrozenSet[str]:
+        return self._weak_patterns
+    
+    @weak_patterns.setter
+    def weak_patterns(self, patterns: Iterable[str]):
+        self._weak_patterns = frozenset(patterns)
+        self._routing_changed()
+    
+    @property
+    def override_margin(self) -> float:
+        return self._override_margin
+    
+    @override_margin.setter
+    def override_margin(self, margin: float):
+        self._override_margin = margin
+        self._routing_changed()
+    
+    @property
+    def models(self) -> Dict[str, BaseModel]:
+        return self._models
+    
+    @models.setter
+    def models(self, models: Dict[str, BaseModel]):
+        self._models = models
+        self._models_changed()
+    
+    def _models_changed(self):
+        # A replaced model must not serve its predecessor's responses
+        self._response_cache.clear()
+        self._routing_changed()
+    
+    @property
+    def intent_models(self) -> Dict[str, str]:
+        return self._intent_models
+    
+    @intent_models.setter
+    def intent_models(self, intent_models: Dict[str, str]):
+        self._intent_models = intent_models
+        self._routing_changed()
+    
+    @property
+    def intent_patterns(self) -> Dict[str, List[str]]:
+        return self._intent_patterns
+    
+    @intent_patterns.setter
+    def intent_patterns(self, patterns: Dict[str, List[str]]):
+        self._intent_patterns = patterns
+        self._routing_changed()
+    
+    @property
+    def intent_weights(self) -> Dict[str, float]:
+        return self._intent_weights
+    
+    @intent_weights.setter
+    def intent_weights(self, weights: Dict[str, float]):
+        self._intent_weights = weights
+        self._routing_changed()
+    
+    @property
+    def intent_priorities(self) -> Dict[str, int]:
+        return self._intent_priorities
+    
+    @intent_priorities.setter
+    def intent_priorities(self, priorities: Dict[str, int]):
+        self._intent_priorities = priorities
+        self._routing_changed()
+    
+    def _routing_changed(self):
+        self._matcher = None
+        self._intent_cache.clear()
+    
+    def _check_routing(self):
+        """Drop what was derived from configuration changed in place since the last lookup"""
+        models = tuple((name, id(model)) for name, model in self._models.items())
+        if models != self._models_fingerprint:
+            self._response_cache.clear()
+            self._models_fingerprint = models
+        
+        fingerprint = hash((
+            tuple((intent, tuple(patterns)) for intent, patterns in self._intent_patterns.items()),
+            tuple(self._intent_weights.items()),
+            tuple(self._intent_priorities.items()),
+            tuple(self._intent_models.items()),
+            models
+        ))
+        if fingerprint != self._routing_fingerprint:
+            self._matcher = None
+            self._intent_cache.clear()
+            self._routing_fingerprint = fingerprint
+    
+    @property
+    def matcher(self) -> IntentMatcher:
+        """The compiled intent matcher for the current configuration"""
+        self._check_routing()
+        if self._matcher is None:
+            self._matcher = IntentMatcher(self.intent_patterns, self.intent_weights, 
+                                          self.intent_priorities)
+        return self._matcher
+    
+    @property
+    def classifier(self) -> SemanticIntentClassifier:
+        """The semantic intent classifier, built on first use"""
+        if self._classifier is None:
+            self._classifier = SemanticIntentClassifier()
+        return self._classifier
+    
+    @classifier.setter
+    def classifier(self, classifier: SemanticIntentClassifier):
+        self._classifier = classifier
+        self._routing_changed()
+    
+    @staticmethod
+    def _normalize_input(user_input: str) -> str:
+        """Lowercase and collapse whitespace, so trivially different inputs share a decision"""
+        return " ".join(user_input.lower().split())
+    
+    def _cached_intent(self, key: bytes) -> Optional[str]:
+        """Look up a routing decision, counting the hit or miss"""
+        if self.intent_mode == "semantic" and self._classifier is not None \
+                and self._classifier.version != self._classifier_version:
+            # The classifier was refit since these decisions were made
+            self._intent_cache.clear()
+            self._classifier_version = self._classifier.version
+        
+        intent = self._intent_cache.get(key)
+        if intent is None:
+            self.intent_cache_misses += 1
+            return None
+        self._intent_cache.move_to_end(key)
+        self.intent_cache_hits += 1
+        return intent
+    
+    def _cache_intent(self, key: bytes, intent: str):
+        self._intent_cache[key] = intent
+        while len(self._intent_cache) > self.intent_cache_size:
+            self._intent_cache.popitem(last=False)
+    
+    def intent_cache_info(self) -> Dict[str, int]:
+        """
+        Get routing decision cache statistics
+        
+        Returns:
+            Hits, misses, current size and maximum size
+        """
+        return {
+            "hits": self.intent_cache_hits,
+            "misses": self.intent_cache_misses,
+            "size": len(self._intent_cache),
+            "max_size": self.intent_cache_size
+        }
+    
     def _detect_intent(self, user_input: str) -> str:
         """
         Detect the intent of the user input
@@ -125,17 +862,95 @@ class ModelRouter:
         Returns:
             The detected intent (summarize, code, creative, or default)
         """
-        user_input_lower = user_input.lower()
+        return self.detect_intents([user_input])[0]
+    
+    def detect_intents(self, user_inputs: List[str]) -> List[str]:
+        """
+        Detect the intents of a batch of inputs
+        
+        Decisions are cached by a hash of the normalized input. In semantic
+        mode the uncached inputs are classified with one matrix product.
+        
+        Args:
+            user_inputs: The users' input texts
+            
+        Returns:
+            The detected intent of each input, in order
+        """
+        self._check_routing()
+        normalized = [self._normalize_input(user_input) for user_input in user_inputs]
+        intents: List[Optional[str]] = [None] * len(normalized)
+        keys: List[Optional[bytes]] = [None] * len(normalized)
+        
+        if self.intent_cache_size:
+            for i, text in enumerate(normalized):
+                keys[i] = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+                intents[i] = self._cached_intent(keys[i])
+        
+        missing = [i for i, intent in enumerate(intents) if intent is None]
+        if missing:
+            texts = [normalized[i] for i in missing]
+            if self.intent_mode == "semantic":
+                detected = self._classify_intents(texts)
+            else:
+                detected = [self._match_intent(text) for text in texts]
+            for i, intent in zip(missing, detected):
+                intents[i] = intent
+                if keys[i] is not None:
+                    self._cache_intent(keys[i], intent)
+        
+        return intents
+    
+    def _classify_intents(self, texts: List[str]) -> List[str]:
+        """Detect intents in semantic mode, classifying the batch with one matrix product"""
+        predictions = self.classifier.predict_many(texts)
+        matcher = self.matcher
+        return [self._resolve_intent(matcher.contenders(text), prediction)
+                for text, prediction in zip(texts, predictions)]
+    
+    def _resolve_intent(self, contenders: List[Tuple[str, List[str]]], 
+                       prediction: Tuple[Optional[str], float, float]) -> str:
+        """
+        Weigh a semantic prediction against the pattern matches
+        
+        A confident prediction decides, unless a specific (not weak)
+        keyword names another intent and the prediction leads its runner-up
+        by less than override_margin. When the classifier is not confident,
+        the best pattern match decides, preferring specific keywords.
+        """
+        intent, similarity, margin = prediction
+        specific = [(candidate, patterns) for candidate, patterns in contenders
+                    if any(pattern not in self.weak_patterns for pattern in patterns)]
         
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, user_input_lower):
-                    logger.info(f"Detected intent '{intent}' based on pattern '{pattern}'")
-                    return intent
+        if intent is not None and self.classifier.is_confident(similarity, margin):
+            if not specific or margin >= self.override_margin \
+                    or intent in (candidate for candidate, _ in specific):
+                logger.info(f"Classified intent '{intent}' with similarity {similarity:.2f}")
+                return intent
+        
+        for candidate, patterns in specific or contenders:
+            logger.info(f"Detected intent '{candidate}' based on pattern '{patterns[0]}'")
+            return candidate
         
         logger.info("No specific intent detected, using default")
         return "default"
     
+    def _match_intent(self, user_input: str) -> str:
+        """Detect the intent with the compiled pattern matcher"""
+        match = self.matcher.match(user_input)
+        if match is not None:
+            intent, pattern = match
+            logger.info(f"Detected intent '{intent}' based on pattern '{pattern}'")
+            return intent
+        
+        logger.info("No specific intent detected, using default")
+        return "default"
+    
+    def _model_for(self, intent: str) -> BaseModel:
+        """The model that serves an intent, falling back to the default model"""
+        name = self.intent_models.get(intent, intent)
+        return self.models.get(name, self.models["default"])
+    
     async def route_request(self, user_input: str, parameters: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Route the request to the appropriate model based on intent
@@ -148,11 +963,180 @@ class ModelRouter:
             The response from the selected model
         """
         intent = self._detect_intent(user_input)
+        model = self._model_for(intent)
+        
+        if not self.response_cache_size and not self.coalesce_requests:
+            logger.info(f"Routing request to {model.name} model")
+            response, _ = await self._generate(model, user_input, parameters)
+            return response
         
-        if intent in self.models:
-            model = self.models[intent]
+        key = self._response_key(model, user_input, parameters)
+        cached = self._cached_response(key)
+        if cached is not None:
+            logger.info(f"Serving cached {model.name} response")
+            return dict(cached)
+        
+        generation = self._inflight.get(key) if self.coalesce_requests else None
+        if generation is None:
+            logger.info(f"Routing request to {model.name} model")
+            generation = asyncio.ensure_future(
+                self._generate_shared(key, model, user_input, parameters)
+            )
+            if self.coalesce_requests:
+                self._inflight[key] = generation
         else:
-            model = self.models["default"]
+            self.coalesced_requests += 1
+            logger.info(f"Joining in-flight {model.name} request")
+        
+        # Shielded, so one caller giving up does not cancel the others' generation
+        return dict(await asyncio.shield(generation))
+    
+    async def route_stream(self, user_input: str, 
+                          parameters: Dict[str, Any] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Route the request like route_request, streaming the model's response
+        
+        The model's generation slot is held until the stream ends or the
+        caller stops iterating. A cached response is replayed as one final
+        chunk, and a completed stream fills the response cache.
+        
+        Args:
+            user_input: The user's input text
+            parameters: Additional parameters for the model
+            
+        Yields:
+            Response chunks, see BaseModel.stream_response
+        """
+        intent = self._detect_intent(user_input)
+        model = self._model_for(intent)
+        
+        key = self._response_key(model, user_input, parameters)
+        cached = self._cached_response(key)
+        if cached is not None:
+            logger.info(f"Serving cached {model.name} response")
+            yield dict(cached, delta=cached.get("response", ""), done=True)
+            return
         
-        logger.info(f"Routing request to {model.name} model")
-        return await model.generate_response(user_input, parameters)
+        async with AsyncExitStack() as stack:
+            served_by = await self._reserve(stack, model)
+            logger.info(f"Streaming request from {served_by.name} model")
+            async for chunk in served_by.stream_response(user_input, parameters):
+                if chunk.get("done") and served_by is model:
+                    self._store_response(key, {name: value for name, value in chunk.items() 
+                                               if name not in ("delta", "done")})
+                yield chunk
+    
+    @staticmethod
+    def _response_key(model: BaseModel, user_input: str, parameters: Dict[str, Any]) -> bytes:
+        """Hash of the model, the input without surrounding whitespace, and the parameters"""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (model.name, user_input.strip(), 
+                     json.dumps(parameters or {}, sort_keys=True, default=str)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.digest()
+    
+    def _cached_response(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """Look up an unexpired cached response, counting the hit or miss"""
+        if not self.response_cache_size:
+            return None
+        entry = self._response_cache.get(key)
+        if entry is not None:
+            expires, response = entry
+            if expires > time.monotonic():
+                self._response_cache.move_to_end(key)
+                self.response_cache_hits += 1
+                return response
+            del self._response_cache[key]
+        self.response_cache_misses += 1
+        return None
+    
+    async def _generate_shared(self, key: bytes, model: BaseModel, user_input: str, 
+                              parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one generation on behalf of every caller waiting on its key"""
+        try:
+            response, served_by = await self._generate(model, user_input, parameters)
+            # Fallback responses are not cached under the overloaded model's key
+            if served_by is model:
+                self._store_response(key, response)
+            return response
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+    
+    def _store_response(self, key: bytes, response: Dict[str, Any]):
+        if not self.response_cache_size:
+            return
+        self._response_cache[key] = (time.monotonic() + self.response_cache_ttl, response)
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > self.response_cache_size:
+            self._response_cache.popitem(last=False)
+    
+    def _limiter(self, model: BaseModel) -> ModelLimiter:
+        """The concurrency limiter of a model, created on first use"""
+        limiter = self.limiters.get(model.name)
+        if limiter is None:
+            limits = dict(self.default_limits, **self.model_limits.get(model.name, {}))
+            limiter = ModelLimiter(model.name, **limits)
+            self.limiters[model.name] = limiter
+        return limiter
+    
+    async def _generate(self, model: BaseModel, user_input: str, 
+                       parameters: Dict[str, Any]) -> Tuple[Dict[str, Any], BaseModel]:
+        """
+        Generate a response within the model's concurrency limits
+        
+        Returns:
+            The response and the model that produced it
+        """
+        async with AsyncExitStack() as stack:
+            served_by = await self._reserve(stack, model)
+            return await served_by.generate_response(user_input, parameters), served_by
+    
+    async def _reserve(self, stack: AsyncExitStack, model: BaseModel) -> BaseModel:
+        """
+        Take a generation slot, held until the stack closes
+        
+        Returns:
+            The model that got the slot: the requested one, or the default
+            model when the requested one is overloaded and the policy allows
+        """
+        try:
+            await stack.enter_async_context(self._limiter(model).slot())
+            return model
+        except ModelOverloadedError as e:
+            default = self.models["default"]
+            if self.overload_policy != "fallback" or model is default:
+                raise
+            logger.warning(f"{str(e)}; falling back to {default.name} model")
+            await stack.enter_async_context(self._limiter(default).slot())
+            return default
+    
+    def model_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get queueing metrics for every model that has served requests
+        
+        Returns:
+            Queue depth, active generations, counters and wait times, by model name
+        """
+        return {name: limiter.metrics() for name, limiter in self.limiters.items()}
+    
+    def response_cache_info(self) -> Dict[str, int]:
+        """
+        Get response cache and request coalescing statistics
+        
+        Returns:
+            Cache hits and misses, coalesced requests, cache size and in-flight generations
+        """
+        return {
+            "hits": self.response_cache_hits,
+            "misses": self.response_cache_misses,
+            "coalesced": self.coalesced_requests,
+            "size": len(self._response_cache),
+            "max_size": self.response_cache_size,
+            "in_flight": len(self._inflight)
+        }
+    
+    def clear_response_cache(self):
+        """Drop every cached response"""
+        self._response_cache.clear()
@@ -0,0 +1,26 @@
+"""
+Tests for the SoulCoreHub embedding providers
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+
+from mcp.embedding_provider import HashingEmbeddingProvider
+
+def test_hashing_embed_many_runs_off_the_event_loop():
+    provider = HashingEmbeddingProvider(64)
+    threads = []
+    encode = provider.encode
+    def recording_encode(texts):
+        threads.append(threading.get_ident())
+        return encode(texts)
+    provider.encode = recording_encode
+    
+    async def run():
+        return threading.get_ident(), await provider.embed_many(["ocean tides", "city lights"])
+    
+    loop_thread, vectors = asyncio.run(run())
+    assert threads and loop_thread not in threads
+    np.testing.assert_array_equal(np.stack(vectors), encode(["ocean tides", "city lights"]))
@@ -0,0 +1,459 @@
+"""
+Tests for the SoulCoreHub memory system
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from mcp.memory_system import ULID_ALPHABET, MemorySystem, UlidGenerator
+from mcp.vector_index import IVFFlatIndex
+
+DIMENSION = 64
+
+CONTENTS = ["zebra stripes", "ocean tides", "mountain air", "city lights", "forest rain"]
+
+def sidecar_system(path: str) -> MemorySystem:
+    return MemorySystem(os.path.join(path, "memory.db"), vector_dimension=DIMENSION,
+                        index=None, search_mode="exact", embedding_storage="sidecar")
+
+def test_exact_search_ignores_unindexed_sidecar_rows(tmp_path):
+    async def run():
+        async with sidecar_system(tmp_path) as memory:
+            for content in CONTENTS[:3]:
+                stored = await memory.store(content)
+            await memory.forget(stored.memory_id)
+        
+        # The forgotten row stays in the file but is not indexed on reopen
+        async with sidecar_system(tmp_path) as memory:
+            return await memory.search("zebra stripes", limit=5)
+    
+    results = asyncio.run(run())
+    assert [memory.content for memory in results][0] == "zebra stripes"
+    assert len(results) == 2
+
+def test_exact_search_after_compaction(tmp_path):
+    async def run():
+        async with sidecar_system(tmp_path) as memory:
+            ids = [(await memory.store(content)).memory_id for content in CONTENTS]
+            await memory.search("zebra stripes", limit=1)
+            await memory.forget(ids[0])
+            await memory.forget(ids[2])
+            reclaimed = await memory.compact_embeddings()
+            return reclaimed, await memory.search("forest rain", limit=5)
+    
+    reclaimed, results = asyncio.run(run())
+    assert reclaimed == 2
+    assert [memory.content for memory in results][0] == "forest rain"
+    assert sorted(memory.content for memory in results) == sorted(CONTENTS[i] for i in (1, 3, 4))
+
+def compact_after_reads(memory: MemorySystem):
+    """Run a compaction between every database read and the use of its rows"""
+    read = memory.db.read
+    async def read_then_compact(func, *args):
+        rows = await read(func, *args)
+        await memory.compact_embeddings()
+        return rows
+    memory.db.read = read_then_compact
+
+def test_reads_racing_compaction_get_their_own_embeddings(tmp_path):
+    async def run():
+        async with sidecar_system(tmp_path) as memory:
+            ids = [(await memory.store(content)).memory_id for content in CONTENTS]
+            expected = await memory.embedder.embed(CONTENTS[4])
+            await memory.forget(ids[0])
+            await memory.forget(ids[2])
+            compact_after_reads(memory)
+            retrieved = await memory.retrieve(ids[4])
+            return expected, retrieved
+    
+    expected, retrieved = asyncio.run(run())
+    np.testing.assert_allclose(retrieved.embedding, expected, rtol=1e-6)
+
+def test_export_racing_compaction_writes_the_right_embeddings(tmp_path):
+    async def run():
+        async with sidecar_system(tmp_path) as source:
+            ids = [(await source.store(content)).memory_id for content in CONTENTS]
+            await source.forget(ids[0])
+            compact_after_reads(source)
+            await source.export(os.path.join(tmp_path, "export"), chunk_size=2)
+            expected = {memory_id: await source.embedder.embed(content)
+                        for memory_id, content in zip(ids[1:], CONTENTS[1:])}
+        async with MemorySystem(os.path.join(tmp_path, "b", "memory.db"), 
+                                vector_dimension=DIMENSION) as target:
+            await target.import_(os.path.join(tmp_path, "export"))
+            return expected, {memory_id: await target.retrieve(memory_id) for memory_id in expected}
+    
+    expected, imported = asyncio.run(run())
+    for memory_id, embedding in expected.items():
+        np.testing.assert_allclose(imported[memory_id].embedding, embedding, rtol=1e-6)
+
+def test_search_during_store_is_not_cached_stale(tmp_path):
+    async def run():
+        memory = MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION)
+        async with memory:
+            await memory.store("ocean tides")
+            
+            # Hold the write open long enough for the search to run inside it
+            write = memory.db.write
+            async def slow_write(func, *args):
+                await asyncio.sleep(0.05)
+                return await write(func, *args)
+            memory.db.write = slow_write
+            
+            store = asyncio.ensure_future(memory.store("zebra stripes"))
+            await asyncio.sleep(0.01)
+            during = await memory.search("zebra stripes", limit=5)
+            await store
+            after = await memory.search("zebra stripes", limit=5)
+            return during, after
+    
+    during, after = asyncio.run(run())
+    assert "zebra stripes" not in [memory.content for memory in during]
+    assert "zebra stripes" in [memory.content for memory in after]
+
+def test_ivf_index_trains_in_background(tmp_path):
+    async def run():
+        index = IVFFlatIndex(DIMENSION, min_train_size=64)
+        memory = MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                              index=index)
+        async with memory:
+            await memory.store_many([{"content": f"note number {i}"} for i in range(100)])
+            assert memory._training_task is not None
+            await memory._training_task
+            return index.is_trained, await memory.search("note number 42", limit=1)
+    
+    trained, results = asyncio.run(run())
+    assert trained
+    assert results[0].content == "note number 42"
+
+def test_export_keeps_float64_embeddings(tmp_path):
+    embedding = np.random.default_rng(0).standard_normal(DIMENSION)
+    
+    async def run():
+        options = {"vector_dimension": DIMENSION, "embedding_dtype": "float64"}
+        async with MemorySystem(os.path.join(tmp_path, "a", "memory.db"), **options) as source:
+            stored = await source.store("precise", embedding=embedding)
+        # Exported the way the CLI opens it, with the default float32 configuration
+        async with MemorySystem(os.path.join(tmp_path, "a", "memory.db"), 
+                                vector_dimension=DIMENSION) as source:
+            await source.export(os.path.join(tmp_path, "export"))
+        async with MemorySystem(os.path.join(tmp_path, "b", "memory.db"), **options) as target:
+            await target.import_(os.path.join(tmp_path, "export"))
+            return await target.retrieve(stored.memory_id)
+    
+    memory = asyncio.run(run())
+    with open(os.path.join(tmp_path, "export", "manifest.json")) as f:
+        assert json.load(f)["embedding_dtype"] == "float64"
+    assert memory.embedding.dtype == np.float64
+    assert np.array_equal(memory.embedding, embedding)
+
+def dedup_system(path) -> MemorySystem:
+    return MemorySystem(os.path.join(path, "memory.db"), vector_dimension=DIMENSION,
+                        dedup_threshold=0.95)
+
+def test_dedup_merges_a_repeated_store(tmp_path):
+    async def run():
+        async with dedup_system(tmp_path) as memory:
+            first = await memory.store("zebra stripes", {"tags": ["animals"]}, importance=0.2)
+            second = await memory.store("zebra stripes", {"tags": ["stripes"]}, importance=0.9)
+            return first, second, (await memory.get_stats())["total_memories"]
+    
+    first, second, total = asyncio.run(run())
+    assert second.memory_id == first.memory_id
+    assert second.importance == 0.9
+    assert second.metadata["tags"] == ["animals", "stripes"]
+    assert total == 1
+
+def test_dedup_merges_within_a_batch(tmp_path):
+    async def run():
+        async with dedup_system(tmp_path) as memory:
+            stored = await memory.store_many([{"content": "zebra stripes"}, 
+                                              {"content": "ocean tides"},
+                                              {"content": "zebra stripes"}])
+            return stored, (await memory.get_stats())["total_memories"]
+    
+    stored, total = asyncio.run(run())
+    assert stored[0].memory_id == stored[2].memory_id
+    assert stored[0].access_count == 1
+    assert total == 2
+
+def test_dedup_stores_a_duplicate_whose_target_vanished(tmp_path):
+    async def run():
+        async with dedup_system(tmp_path) as memory:
+            target = await memory.store("zebra stripes")
+            
+            # Forget the target after the duplicate check, before the write
+            write = memory.db.write
+            async def forget_first(func, *args):
+                memory.db.write = write
+                await memory.forget(target.memory_id)
+                return await write(func, *args)
+            memory.db.write = forget_first
+            
+            stored = await memory.store("zebra stripes")
+            return target, stored, await memory.retrieve(stored.memory_id)
+    
+    target, stored, retrieved = asyncio.run(run())
+    assert stored.memory_id != target.memory_id
+    assert retrieved is not None and retrieved.content == "zebra stripes"
+
+def test_exact_index_keeps_stores_made_while_it_builds(tmp_path):
+    async def run():
+        memory = MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION)
+        async with memory:
+            await memory.store("ocean tides")
+            
+            # Hold the build open after it has read its snapshot
+            fill, filled, release = memory._fill_index, threading.Event(), threading.Event()
+            def slow_fill(*args):
+                fill(*args)
+                filled.set()
+                release.wait(5)
+            memory._fill_index = slow_fill
+            
+            loop = asyncio.get_running_loop()
+            build = asyncio.ensure_future(memory.search("ocean tides", mode="exact"))
+            await loop.run_in_executor(None, filled.wait, 5)
+            await memory.store("zebra stripes")
+            release.set()
+            await build
+            return await memory.search("zebra stripes", mode="exact", limit=5)
+    
+    results = asyncio.run(run())
+    assert "zebra stripes" in [memory.content for memory in results]
+
+def test_hybrid_search_ranks_keyword_matches(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            ids = {content: (await memory.store(content)).memory_id for content in CONTENTS}
+            found = await memory.hybrid_search("ocean", limit=3)
+            await memory.forget(ids["ocean tides"])
+            after = await memory.hybrid_search("ocean", limit=3)
+            # Query syntax in the input is searched for as plain terms
+            quoted = await memory.hybrid_search('tides" OR city*', limit=3)
+            return found, after, quoted
+    
+    found, after, quoted = asyncio.run(run())
+    assert found[0].content == "ocean tides"
+    assert "ocean tides" not in [memory.content for memory in after]
+    assert quoted[0].content == "city lights"
+
+def test_hybrid_search_prefilters_on_enough_keyword_matches(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            await memory.store_many(CONTENTS + ["high tides", "tides table", "tidal pools"])
+            return await memory.hybrid_search("tides", limit=3)
+    
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert all("tides" in memory.content for memory in results)
+
+def test_search_filters_are_applied_before_ranking(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None, indexed_metadata_keys=["agent"]) as memory:
+            await memory.store("ocean tides", {"tags": ["sea", "water"], "agent": "anima"}, 
+                               importance=0.9)
+            await memory.store("ocean waves", {"tags": ["sea"], "agent": "gptsoul", "pinned": True},
+                               importance=0.4)
+            await memory.store("ocean liner", {"tags": ["ship"], "agent": "anima"}, importance=0.6)
+            middle = datetime.now().isoformat()
+            await memory.store("ocean floor", {"tags": ["water"], "agent": "gptsoul"}, importance=0.2)
+            
+            async def contents(**filters):
+                return sorted(found.content for found in 
+                              await memory.search("ocean", limit=10, **filters))
+            
+            return {
+                "tags_any": await contents(tags_any=["ship", "water"]),
+                "tags_all": await contents(tags_all=["sea", "water"]),
+                "after": await contents(created_after=middle),
+                "before": await contents(created_before=middle),
+                "importance": await contents(min_importance=0.5),
+                "metadata": await contents(metadata={"agent": "anima"}),
+                "bool": await contents(metadata={"pinned": True}),
+                "combined": await contents(tags_any=["sea"], metadata={"agent": "gptsoul"}),
+                "none": await contents(tags_any=["missing"])
+            }
+    
+    results = asyncio.run(run())
+    assert results["tags_any"] == ["ocean floor", "ocean liner", "ocean tides"]
+    assert results["tags_all"] == ["ocean tides"]
+    assert results["after"] == ["ocean floor"]
+    assert results["before"] == ["ocean liner", "ocean tides", "ocean waves"]
+    assert results["importance"] == ["ocean liner", "ocean tides"]
+    assert results["metadata"] == ["ocean liner", "ocean tides"]
+    assert results["bool"] == ["ocean waves"]
+    assert results["combined"] == ["ocean waves"]
+    assert results["none"] == []
+
+def test_search_rejects_unsafe_metadata_keys(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            await memory.search("ocean", metadata={"agent') OR 1=1 --": "x"})
+    
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+async def make_idle(memory: MemorySystem, memory_id: str, days: float, access_count: int = 0):
+    """Pretend a memory was last accessed days ago"""
+    last_accessed = (datetime.now() - timedelta(days=days)).isoformat()
+    await memory.db.write(lambda conn: conn.execute(
+        'UPDATE memories SET last_accessed = ?, access_count = ? WHERE memory_id = ?',
+        (last_accessed, access_count, memory_id)
+    ))
+
+def test_importance_decays_with_idle_time(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            idle = await memory.store("ocean tides", importance=0.8)
+            popular = await memory.store("city lights", importance=0.8)
+            recent = await memory.store("forest rain", importance=0.8)
+            await make_idle(memory, idle.memory_id, 30)
+            await make_idle(memory, popular.memory_id, 30, access_count=10)
+            
+            decayed = await memory.decay_importance(half_life_days=30)
+            # An immediate second run has no further idle time to apply
+            await memory.decay_importance(half_life_days=30)
+            return decayed, {stored.content: (await memory.retrieve(stored.memory_id)).importance
+                             for stored in (idle, popular, recent)}
+    
+    decayed, importance = asyncio.run(run())
+    assert decayed == 2
+    assert abs(importance["ocean tides"] - 0.4) < 0.01
+    # Frequent access stretches the half-life
+    assert 0.4 < importance["city lights"] < 0.8 * 0.5 ** (1 / (1 + np.log1p(10))) + 0.01
+    assert importance["forest rain"] == 0.8
+
+def test_evict_archives_unimportant_memories_and_keeps_the_budget(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            for content, importance in zip(CONTENTS, (0.01, 0.9, 0.3, 0.6, 0.02)):
+                await memory.store(content, importance=importance)
+            evicted = await memory.evict(min_importance=0.05, max_memories=2)
+            remaining = sorted(found.content for found in await memory.search("ocean", limit=10))
+            archived = await memory.db.read(lambda conn: sorted(row[0] for row in conn.execute(
+                'SELECT content FROM memories_archive'
+            )))
+            return evicted, remaining, archived, await memory.get_stats()
+    
+    evicted, remaining, archived, stats = asyncio.run(run())
+    assert evicted == 3
+    assert remaining == ["city lights", "ocean tides"]
+    assert archived == ["forest rain", "mountain air", "zebra stripes"]
+    assert stats["total_memories"] == 2
+
+def test_maintenance_compacts_the_sidecar_after_eviction(tmp_path):
+    async def run():
+        async with sidecar_system(tmp_path) as memory:
+            for content, importance in zip(CONTENTS, (0.01, 0.9, 0.01, 0.6, 0.5)):
+                await memory.store(content, importance=importance)
+            result = await memory.run_maintenance(min_importance=0.05)
+            archived = await memory.db.read(lambda conn: conn.execute(
+                'SELECT COUNT(*) FROM memories_archive WHERE embedding IS NOT NULL'
+            ).fetchone()[0])
+            return result, archived, await memory.search("city lights", limit=5)
+    
+    result, archived, results = asyncio.run(run())
+    assert result["evicted"] == 2
+    assert result["sidecar_rows_reclaimed"] == 2
+    # Sidecar rows are archived as copies, since compaction drops them
+    assert archived == 2
+    assert results[0].content == "city lights"
+    assert len(results) == 3
+
+def test_stats_aggregates_follow_writes(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            tides = await memory.store("ocean tides", {"tags": ["sea", "water"]}, importance=0.8)
+            await memory.store("ocean waves", {"tags": ["sea"]}, importance=0.4)
+            rain = await memory.store("forest rain", {"tags": ["water", "forest"]}, importance=0.6)
+            await memory.store_many([{"content": "city lights", "metadata": {"tags": ["city"]}}])
+            await memory.update_importance(rain.memory_id, 0.2)
+            await memory.forget(tides.memory_id)
+            await memory.search("ocean waves", limit=1)
+            return await memory.get_stats()
+    
+    stats = asyncio.run(run())
+    assert stats["total_memories"] == 3
+    assert abs(stats["average_importance"] - (0.4 + 0.2 + 0.5) / 3) < 1e-9
+    assert {entry["tag"]: entry["count"] for entry in stats["top_tags"]} == \
+        {"sea": 1, "water": 1, "forest": 1, "city": 1}
+    assert stats["most_important"][0]["content"] == "city lights"
+    assert stats["most_accessed"][0]["content"] == "ocean waves"
+    assert stats["most_recent"][0]["content"] == "city lights"
+
+def decode_ulid_time(memory_id: str) -> int:
+    """Millisecond timestamp held in the first ten characters of a ULID"""
+    value = 0
+    for char in memory_id[:10]:
+        value = value * 32 + ULID_ALPHABET.index(char)
+    return value
+
+def test_ulids_are_unique_sorted_and_timestamped():
+    generator = UlidGenerator()
+    before = time.time_ns() // 1_000_000
+    ids = [generator() for _ in range(20000)]
+    after = time.time_ns() // 1_000_000
+    
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert all(len(memory_id) == 26 and set(memory_id) <= set(ULID_ALPHABET) for memory_id in ids)
+    assert before <= decode_ulid_time(ids[0]) <= decode_ulid_time(ids[-1]) <= after + 1
+
+def test_ulids_keep_increasing_when_the_clock_steps_back(monkeypatch):
+    generator = UlidGenerator()
+    clock = iter([5_000_000_000, 4_000_000_000, 4_000_000_000])
+    monkeypatch.setattr(time, "time_ns", lambda: next(clock) * 1_000_000)
+    first, second, third = generator(), generator(), generator()
+    assert first < second < third
+    assert decode_ulid_time(second) == 5_000_000_000
+    
+    # An exhausted random part carries into the next millisecond
+    generator._random = (1 << 80) - 1
+    monkeypatch.setattr(time, "time_ns", lambda: 5_000_000_000 * 1_000_000)
+    assert decode_ulid_time(generator()) == 5_000_000_001
+
+def test_bulk_stores_get_distinct_ids(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            stored = await memory.store_many([f"note {i}" for i in range(2000)])
+            return stored, (await memory.get_stats())["total_memories"]
+    
+    stored, total = asyncio.run(run())
+    assert total == 2000
+    assert [memory.memory_id for memory in stored] == sorted(memory.memory_id for memory in stored)
+
+def test_lazy_memory_releases_raw_values_once_decoded(tmp_path):
+    async def run():
+        async with MemorySystem(os.path.join(tmp_path, "memory.db"), vector_dimension=DIMENSION,
+                                index=None) as memory:
+            stored = await memory.store("ocean tides", {"tags": ["sea"]})
+            return await memory.retrieve(stored.memory_id), await memory.retrieve(stored.memory_id)
+    
+    decoded, assigned = asyncio.run(run())
+    assert decoded._pending is not None
+    assert decoded.metadata == {"tags": ["sea"]}
+    assert decoded.embedding.shape == (DIMENSION,)
+    assert decoded.created_at <= decoded.last_accessed
+    assert decoded._pending is None
+    
+    assigned.metadata = {}
+    assigned.embedding = None
+    assigned.created_at = assigned.last_accessed = datetime.now()
+    assert assigned._pending is None
+    assert assigned.metadata == {}
@@ -0,0 +1,108 @@
+"""
+Tests for the SoulCoreHub model router
+"""
+
+import asyncio
+
+from mcp.model_router import IntentMatcher, ModelOverloadedError, ModelRouter
+
+class SlowModel:
+    """Stand-in generate_response that holds its slot until released"""
+    
+    def __init__(self, model):
+        self.model = model
+        self.release = asyncio.Event()
+        self.calls = 0
+    
+    async def __call__(self, user_input, parameters=None):
+        self.calls += 1
+        await self.release.wait()
+        return {"model_used": self.model.name, "response": user_input}
+
+def test_burst_beyond_queue_is_rejected_with_timeout():
+    async def run():
+        router = ModelRouter(max_concurrency=1, max_queue=1, queue_timeout=5.0,
+                             response_cache_size=0, coalesce_requests=False)
+        model = router.models["default"]
+        model.generate_response = slow = SlowModel(model)
+        
+        # All ten arrive in the same tick, before any acquire has run
+        tasks = [asyncio.ensure_future(router.route_request(f"hello {i}")) for i in range(10)]
+        await asyncio.sleep(0)
+        slow.release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True), router
+    
+    results, router = asyncio.run(run())
+    rejected = [r for r in results if isinstance(r, ModelOverloadedError)]
+    assert len(rejected) == 8
+    assert all(r.reason == "queue_full" for r in rejected)
+    assert router.model_metrics()["default"]["rejected"] == 8
+    assert router.model_metrics()["default"]["completed"] == 2
+
+def test_intent_patterns_match_in_context():
+    # Word boundaries and lookarounds see the text around the hit
+    assert IntentMatcher({"a": [r"\bapi\b"], "c": ["api"]}).scores("apis") == {"c": 1.0}
+    assert IntentMatcher({"a": [r"(?<=my )code"]}).scores("my code") == {"a": 1.0}
+    # A longer pattern starting where an earlier alternative matched is still credited
+    assert IntentMatcher({"code": ["api"], "x": ["apis"]}).scores("apis") == {"code": 1.0, "x": 1.0}
+
+def test_intent_patterns_credit_every_expression_at_a_hit():
+    patterns = {f"i{n}": [rf"\bterm{n}x\b"] for n in range(300)}
+    patterns["late"] = [r"\bterm299\w", r"term2\d+x"]
+    matcher = IntentMatcher(patterns)
+    assert matcher.scores("see term299x and term7x") == {"i299": 1.0, "i7": 1.0, "late": 2.0}
+
+def test_routing_follows_configuration_changed_in_place():
+    router = ModelRouter()
+    assert router.detect_intents(["plan my garden"]) == ["default"]
+    router.intent_patterns["creative"].append("garden")
+    assert router.detect_intents(["plan my garden"]) == ["creative"]
+    router.intent_priorities["summarize"] = 1
+    router.intent_patterns["summarize"].append("plan")
+    assert router.detect_intents(["plan my garden"]) == ["summarize"]
+
+def test_model_replaced_in_place_does_not_serve_cached_responses():
+    class EchoModel:
+        name = "default"
+        
+        def __init__(self, response):
+            self.response = response
+        
+        async def generate_response(self, user_input, parameters=None):
+            return {"model_used": self.name, "response": self.response}
+    
+    async def run():
+        router = ModelRouter()
+        router.models["default"] = EchoModel("first")
+        first = await router.route_request("hello there")
+        router.models["default"] = EchoModel("second")
+        return first, await router.route_request("hello there")
+    
+    first, second = asyncio.run(run())
+    assert first["response"] == "first"
+    assert second["response"] == "second"
+
+def test_semantic_mode_keeps_clear_pattern_matches():
+    router = ModelRouter(intent_mode="semantic")
+    assert router.detect_intents([
+        "write a function to reverse a string in go",
+        "help me debug my python class",
+        "explain how a class works in java"
+    ]) == ["code", "code", "code"]
+
+def test_semantic_mode_routes_school_classes_to_default():
+    router = ModelRouter(intent_mode="semantic")
+    # "class" alone is too generic to outweigh the classifier
+    assert router.detect_intents([
+        "how many students are in a typical class",
+        "when does the chemistry class start",
+        "my yoga class was great"
+    ]) == ["default", "default", "default"]
+    # In regex mode the keyword still decides
+    assert ModelRouter()._detect_intent("my yoga class was great") == "code"
+
+def test_semantic_mode_settles_unclear_matches():
+    router = ModelRouter(intent_mode="semantic")
+    # "class" and the "story" in "history" match code and creative
+    assert router._detect_intent("my history class starts at noon") == "default"
+    assert router._detect_intent("give me the key points of this code review") == "summarize"
@@ -0,0 +1,104 @@
+"""
+Tests for the sharded SoulCoreHub memory system
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from mcp.memory_system import MemorySystem, ShardedMemorySystem
+
+DIMENSION = 64
+
+CONTENTS = ["zebra stripes", "ocean tides", "mountain air", "city lights", "forest rain",
+            "desert sand", "river stones", "autumn leaves"]
+
+def sharded_system(path, **options) -> ShardedMemorySystem:
+    return ShardedMemorySystem(os.path.join(path, "shards"), vector_dimension=DIMENSION, 
+                               index=None, **options)
+
+async def shard_contents(memory: ShardedMemorySystem):
+    return [
+        set(await shard.db.read(lambda conn: [row[0] for row in conn.execute(
+            'SELECT content FROM memories'
+        ).fetchall()]))
+        for shard in memory.shards
+    ]
+
+def test_memories_of_one_partition_share_a_shard(tmp_path):
+    async def run():
+        async with sharded_system(tmp_path, shards=4, partition_key="agent") as memory:
+            await memory.store_many([
+                {"content": f"{agent} note {i}", "metadata": {"agent": agent}}
+                for i in range(10) for agent in ("anima", "gptsoul")
+            ])
+            await memory.store("loose note")
+            return await shard_contents(memory)
+    
+    shards = asyncio.run(run())
+    for agent in ("anima", "gptsoul"):
+        holding = [contents for contents in shards if f"{agent} note 0" in contents]
+        assert len(holding) == 1
+        assert {f"{agent} note {i}" for i in range(10)} <= holding[0]
+    assert sum(len(contents) for contents in shards) == 21
+
+def test_memories_are_spread_by_id_without_a_partition_key(tmp_path):
+    async def run():
+        async with sharded_system(tmp_path, shards=4) as memory:
+            stored = await memory.store_many([f"note {i}" for i in range(40)])
+            shards = await shard_contents(memory)
+            placed = [memory._shard_for(m.memory_id, m.metadata) for m in stored]
+            return stored, shards, placed
+    
+    stored, shards, placed = asyncio.run(run())
+    assert all(contents for contents in shards)
+    for memory, number in zip(stored, placed):
+        assert memory.content in shards[number]
+
+def test_search_merges_the_top_results_of_every_shard(tmp_path):
+    async def run():
+        async with sharded_system(tmp_path, shards=3) as sharded:
+            await sharded.store_many(CONTENTS)
+            merged = await sharded.search("ocean tides", limit=4)
+            holding = await shard_contents(sharded)
+        async with MemorySystem(os.path.join(tmp_path, "single.db"), vector_dimension=DIMENSION,
+                                index=None) as single:
+            await single.store_many(CONTENTS)
+            expected = await single.search("ocean tides", limit=4)
+        return merged, expected, holding
+    
+    merged, expected, holding = asyncio.run(run())
+    assert [memory.content for memory in merged] == [memory.content for memory in expected]
+    assert merged[0].content == "ocean tides"
+    # The results came from more than one shard
+    assert len({number for number, contents in enumerate(holding) 
+                for memory in merged if memory.content in contents}) > 1
+
+def test_retrieve_and_forget_with_a_partition_key(tmp_path):
+    async def run():
+        async with sharded_system(tmp_path, shards=4, partition_key="agent") as memory:
+            stored = await memory.store("ocean tides", {"agent": "anima"})
+            retrieved = await memory.retrieve(stored.memory_id)
+            forgotten = await memory.forget(stored.memory_id)
+            return (retrieved, forgotten, await memory.retrieve(stored.memory_id),
+                    await memory.forget(stored.memory_id))
+    
+    retrieved, forgotten, after, forgotten_again = asyncio.run(run())
+    assert retrieved.content == "ocean tides"
+    assert retrieved.metadata["agent"] == "anima"
+    assert forgotten
+    assert after is None
+    assert not forgotten_again
+
+@pytest.mark.parametrize("options", [{"shards": 3}, {"shards": 2, "partition_key": "agent"}])
+def test_reopening_with_another_layout_is_refused(tmp_path, options):
+    async def run():
+        async with sharded_system(tmp_path, shards=2) as memory:
+            await memory.store("ocean tides")
+        async with sharded_system(tmp_path, shards=2) as memory:
+            assert len(await memory.search("ocean tides")) == 1
+    
+    asyncio.run(run())
+    with pytest.raises(ValueError, match="layout"):
+        sharded_system(tmp_path, **options)
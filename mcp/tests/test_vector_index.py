@@ -0,0 +1,40 @@
+"""
+Tests for the SoulCoreHub vector indexes
+"""
+
+import numpy as np
+
+from mcp.vector_index import IVFFlatIndex
+
+DIMENSION = 16
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+def test_ivf_training_replays_changes_made_during_fit():
+    index = IVFFlatIndex(DIMENSION, min_train_size=64, auto_train=False)
+    data = vectors(200)
+    index.add([f"m{i}" for i in range(100)], data[:100])
+    assert index.needs_training
+    
+    trained = index.fit(*index.begin_training())
+    # Written while fit ran on another thread
+    index.add([f"m{i}" for i in range(100, 200)], data[100:])
+    index.remove(["m0", "m1"])
+    index.add(["m2"], data[150:151])
+    index.finish_training(trained)
+    
+    assert index.is_trained
+    assert len(index) == 198
+    found, stored = index.get_vectors(["m0", "m2", "m199"])
+    assert found == ["m2", "m199"]
+    assert index.search(data[199], 1)[0][0] == "m199"
+    assert np.allclose(stored[0], data[150] / np.linalg.norm(data[150]))
+
+def test_ivf_training_dropped_after_clear():
+    index = IVFFlatIndex(DIMENSION, min_train_size=64, auto_train=False)
+    index.add([f"m{i}" for i in range(100)], vectors(100))
+    trained = index.fit(*index.begin_training())
+    index.clear()
+    index.finish_training(trained)
+    assert len(index) == 0 and not index.is_trained
@@ -0,0 +1,608 @@
+"""
+Vector Index for SoulCoreHub
+Implements in-memory nearest-neighbour indexes over memory embeddings
+"""
+
+import logging
+import numpy as np
+from typing import Callable, Dict, List, Iterable, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Convert vectors to unit-length float32 rows (zero vectors stay zero)"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the positions of the k highest scores, best first"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def _cluster_sums(vectors: np.ndarray, assignments: np.ndarray, n_clusters: int) -> np.ndarray:
+    """Sum the vectors assigned to each cluster"""
+    sums = np.zeros((n_clusters, vectors.shape[1]), dtype=np.float32)
+    order = np.argsort(assignments, kind="stable")
+    clusters, starts = np.unique(assignments[order], return_index=True)
+    sums[clusters] = np.add.reduceat(vectors[order], starts, axis=0)
+    return sums
+
+class _VectorBlock:
+    """A growable, contiguous matrix of unit vectors addressed by memory ID"""
+
+    def __init__(self, dimension: int, capacity: int = 64):
+        self.dimension = dimension
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: List[str], unit_vectors: np.ndarray):
+        """Append unit vectors, growing the backing matrix geometrically"""
+        needed = len(self.ids) + len(ids)
+        if needed > self.vectors.shape[0]:
+            capacity = max(needed, self.vectors.shape[0] * 2)
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:len(self.ids)] = self.vectors[:len(self.ids)]
+            self.vectors = grown
+
+        for memory_id, vector in zip(ids, unit_vectors):
+            if memory_id in self.positions:
+                self.vectors[self.positions[memory_id]] = vector
+                continue
+            position = len(self.ids)
+            self.vectors[position] = vector
+            self.ids.append(memory_id)
+            self.positions[memory_id] = position
+
+    def remove(self, memory_id: str) -> bool:
+        """Remove a vector by swapping the last row into its slot"""
+        position = self.positions.pop(memory_id, None)
+        if position is None:
+            return False
+        last = len(self.ids) - 1
+        if position != last:
+            moved_id = self.ids[last]
+            self.vectors[position] = self.vectors[last]
+            self.ids[position] = moved_id
+            self.positions[moved_id] = position
+        self.ids.pop()
+        return True
+
+    def scores(self, unit_query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every stored vector with a unit query"""
+        return self.vectors[:len(self.ids)] @ unit_query
+
+    def gather(self, ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        """Return the stored IDs among `ids` and their vectors"""
+        found = [memory_id for memory_id in ids if memory_id in self.positions]
+        rows = [self.positions[memory_id] for memory_id in found]
+        return found, self.vectors[rows]
+
+class VectorIndex:
+    """Base class for vector indexes used by the memory system"""
+
+    def __init__(self, dimension: int):
+        """
+        Initialize the index
+
+        Args:
+            dimension: Dimension of the indexed vectors
+        """
+        self.dimension = dimension
+
+    def __len__(self) -> int:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def add(self, ids: List[str], vectors: np.ndarray):
+        """
+        Add (or replace) vectors in the index
+
+        Args:
+            ids: Memory IDs, one per vector
+            vectors: Matrix of shape (len(ids), dimension)
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """
+        Remove vectors from the index
+
+        Args:
+            ids: Memory IDs to remove
+
+        Returns:
+            Number of vectors removed
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """
+        Find the vectors most similar to the query
+
+        Args:
+            query: Query vector
+            k: Maximum number of results to return
+
+        Returns:
+            List of (memory_id, cosine similarity) pairs, best first
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def clear(self):
+        """Remove every vector from the index"""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def get_vectors(self, ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Look up indexed vectors by ID
+
+        Args:
+            ids: Memory IDs to look up
+
+        Returns:
+            The IDs present in the index and a matrix of their vectors
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def search_subset(self, query: np.ndarray, ids: Iterable[str], 
+                     k: int) -> List[Tuple[str, float]]:
+        """
+        Exactly score a query against a subset of the indexed vectors
+
+        Args:
+            query: Query vector
+            ids: Memory IDs eligible for the result
+            k: Maximum number of results to return
+
+        Returns:
+            List of (memory_id, cosine similarity) pairs, best first
+        """
+        found, vectors = self.get_vectors(ids)
+        if not found or k <= 0:
+            return []
+        scores = _normalize(vectors) @ _normalize(query)[0]
+        return [(found[i], float(scores[i])) for i in _top_k(scores, k)]
+
+    def build(self, ids: List[str], vectors: np.ndarray):
+        """Replace the contents of the index"""
+        self.clear()
+        if len(ids):
+            self.add(ids, vectors)
+
+class FlatIndex(VectorIndex):
+    """
+    Exact index over one contiguous float32 matrix
+
+    Rows are normalised when added, so scoring a query is a single
+    matrix-vector product followed by argpartition for the top k.
+    """
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._block)
+
+    def clear(self):
+        self._block = _VectorBlock(self.dimension)
+
+    def add(self, ids: List[str], vectors: np.ndarray):
+        if not len(ids):
+            return
+        unit_vectors = _normalize(vectors)
+        if unit_vectors.shape != (len(ids), self.dimension):
+            raise ValueError(
+                f"Expected vectors of shape ({len(ids)}, {self.dimension}), "
+                f"got {unit_vectors.shape}"
+            )
+        self._block.add(ids, unit_vectors)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        return sum(1 for memory_id in ids if self._block.remove(memory_id))
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if not len(self._block) or k <= 0:
+            return []
+        scores = self._block.scores(_normalize(query)[0])
+        return [(self._block.ids[i], float(scores[i])) for i in _top_k(scores, k)]
+
+    def get_vectors(self, ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        return self._block.gather(ids)
+
+class MmapFlatIndex(VectorIndex):
+    """
+    Exact index that scores the rows of an external matrix in place
+
+    The matrix (typically a memory-mapped embedding file) is never copied;
+    only per-row norms and a liveness mask are kept in memory. Rows are
+    added by their row number instead of by value.
+    """
+
+    def __init__(self, dimension: int, matrix: Callable[[], np.ndarray], 
+                chunk_size: int = 65536):
+        """
+        Initialize the index
+
+        Args:
+            dimension: Dimension of the indexed vectors
+            matrix: Callable returning the current (rows, dimension) matrix
+            chunk_size: Rows scored per matrix-vector product
+        """
+        super().__init__(dimension)
+        self._matrix = matrix
+        self.chunk_size = chunk_size
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def clear(self):
+        self._rows: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = []
+        self._norms = np.ones(0, dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+
+    def add(self, ids: List[str], vectors: np.ndarray):
+        raise NotImplementedError("MmapFlatIndex rows are added with add_rows")
+
+    def add_rows(self, ids: List[str], rows: List[int]):
+        """
+        Index rows of the backing matrix
+
+        Args:
+            ids: Memory IDs, one per row
+            rows: Row numbers in the backing matrix
+        """
+        if not len(ids):
+            return
+        self.remove([memory_id for memory_id in ids if memory_id in self._rows])
+
+        rows = np.asarray(rows, dtype=np.int64)
+        size = int(rows.max()) + 1
+        if size > len(self._live):
+            grow = size - len(self._live)
+            self._norms = np.concatenate([self._norms, np.ones(grow, dtype=np.float32)])
+            self._live = np.concatenate([self._live, np.zeros(grow, dtype=bool)])
+            self._row_ids.extend([None] * grow)
+
+        norms = np.linalg.norm(np.asarray(self._matrix()[rows], dtype=np.float32), axis=1)
+        norms[norms == 0] = 1.0
+        self._norms[rows] = norms
+        self._live[rows] = True
+        for memory_id, row in zip(ids, rows):
+            self._rows[memory_id] = int(row)
+            self._row_ids[row] = memory_id
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for memory_id in ids:
+            row = self._rows.pop(memory_id, None)
+            if row is not None:
+                self._live[row] = False
+                self._row_ids[row] = None
+                removed += 1
+        return removed
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if not self._rows or k <= 0:
+            return []
+        unit_query = _normalize(query)[0]
+        matrix = self._matrix()
+        # The file may hold rows not indexed yet (appended, not yet added),
+        # so only score the rows this index knows about
+        n_rows = min(len(self._live), len(matrix))
+
+        scores = np.empty(n_rows, dtype=np.float32)
+        for start in range(0, n_rows, self.chunk_size):
+            chunk = matrix[start:min(start + self.chunk_size, n_rows)]
+            if chunk.dtype != np.float32:
+                chunk = chunk.astype(np.float32)
+            scores[start:start + len(chunk)] = chunk @ unit_query
+        scores /= self._norms[:n_rows]
+        live = self._live[:n_rows]
+        scores[~live] = -np.inf
+
+        top = _top_k(scores, min(k, int(live.sum())))
+        return [(self._row_ids[i], float(scores[i])) for i in top]
+
+    def get_vectors(self, ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        found = [memory_id for memory_id in ids if memory_id in self._rows]
+        rows = np.asarray([self._rows[memory_id] for memory_id in found], dtype=np.int64)
+        matrix = self._matrix()
+        vectors = np.asarray(matrix[rows], dtype=np.float32) if len(rows) else \
+            np.empty((0, self.dimension), dtype=np.float32)
+        return found, vectors
+
+class IVFFlatIndex(VectorIndex):
+    """
+    Inverted-file index with exact scoring inside each list
+
+    Vectors are clustered with spherical k-means into roughly sqrt(N)
+    lists. A query is compared with the list centroids and only the
+    n_probe closest lists are scanned (2 * sqrt(n_lists) by default), so
+    search cost grows sub-linearly with the store size. Until enough
+    vectors exist to train the clustering the index scans everything.
+
+    Training can also run off the calling thread: begin_training snapshots
+    the vectors, fit clusters them without touching the index, and
+    finish_training installs the result and replays the adds and removes
+    made in the meantime.
+    """
+
+    def __init__(self, dimension: int, n_lists: int = None, n_probe: int = None,
+                min_train_size: int = 2048, max_train_samples: int = 65536,
+                kmeans_iterations: int = 10, seed: int = 0, auto_train: bool = True):
+        """
+        Initialize the index
+
+        Args:
+            dimension: Dimension of the indexed vectors
+            n_lists: Number of inverted lists (defaults to sqrt of the store size)
+            n_probe: Number of lists scanned per query (scales with n_lists by default)
+            min_train_size: Vectors required before the clustering is trained
+            max_train_samples: Maximum vectors sampled for k-means training
+            kmeans_iterations: Number of k-means refinement passes
+            seed: Seed for the training sample and centroid initialisation
+            auto_train: Train inside add whenever needs_training; when False
+                the owner is expected to check needs_training and train
+        """
+        super().__init__(dimension)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.max_train_samples = max_train_samples
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.auto_train = auto_train
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def needs_training(self) -> bool:
+        """Whether the store is large enough to train, or has outgrown its lists"""
+        if not self.is_trained:
+            return self._size >= self.min_train_size
+        return self.n_lists is None and self._size > 4 * self._trained_size
+
+    def clear(self):
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[_VectorBlock] = [_VectorBlock(self.dimension)]
+        self._where: Dict[str, int] = {}
+        self._size = 0
+        self._trained_size = 0
+        # IDs added or removed since begin_training, None when not training
+        self._changed: Optional[set] = None
+
+    def add(self, ids: List[str], vectors: np.ndarray):
+        if not len(ids):
+            return
+        unit_vectors = _normalize(vectors)
+        if unit_vectors.shape != (len(ids), self.dimension):
+            raise ValueError(
+                f"Expected vectors of shape ({len(ids)}, {self.dimension}), "
+                f"got {unit_vectors.shape}"
+            )
+
+        # Replacing an existing vector may move it to another list
+        self.remove([memory_id for memory_id in ids if memory_id in self._where])
+        if self._changed is not None:
+            self._changed.update(ids)
+
+        if self.is_trained:
+            assignments = self._assign(unit_vectors)
+        else:
+            assignments = np.zeros(len(ids), dtype=np.int64)
+
+        for list_no in np.unique(assignments):
+            mask = assignments == list_no
+            list_ids = [memory_id for memory_id, keep in zip(ids, mask) if keep]
+            self._lists[list_no].add(list_ids, unit_vectors[mask])
+            for memory_id in list_ids:
+                self._where[memory_id] = int(list_no)
+        self._size = len(self._where)
+
+        # Train once the store is large enough, and retrain as it outgrows the lists
+        if self.auto_train and self.needs_training:
+            self.train()
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for memory_id in ids:
+            list_no = self._where.pop(memory_id, None)
+            if list_no is not None and self._lists[list_no].remove(memory_id):
+                removed += 1
+                if self._changed is not None:
+                    self._changed.add(memory_id)
+        self._size = len(self._where)
+        return removed
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if self._size == 0 or k <= 0:
+            return []
+        unit_query = _normalize(query)[0]
+
+        if self.is_trained:
+            n_probe = self.n_probe or max(8, int(2 * np.sqrt(len(self._lists))))
+            n_probe = min(n_probe, len(self._lists))
+            probed = _top_k(self._centroids @ unit_query, n_probe)
+        else:
+            probed = [0]
+
+        ids: List[str] = []
+        scores = []
+        for list_no in probed:
+            block = self._lists[list_no]
+            if len(block):
+                ids.extend(block.ids)
+                scores.append(block.scores(unit_query))
+        if not scores:
+            return []
+
+        scores = np.concatenate(scores)
+        return [(ids[i], float(scores[i])) for i in _top_k(scores, k)]
+
+    def get_vectors(self, ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        found, vectors = [], []
+        by_list: Dict[int, List[str]] = {}
+        for memory_id in ids:
+            list_no = self._where.get(memory_id)
+            if list_no is not None:
+                by_list.setdefault(list_no, []).append(memory_id)
+        for list_no, list_ids in by_list.items():
+            list_found, list_vectors = self._lists[list_no].gather(list_ids)
+            found.extend(list_found)
+            vectors.append(list_vectors)
+        if not found:
+            return [], np.empty((0, self.dimension), dtype=np.float32)
+        return found, np.concatenate(vectors)
+
+    def train(self):
+        """Cluster the indexed vectors and redistribute them over the lists"""
+        ids, vectors = self._contents()
+        if ids:
+            self._install(self.fit(ids, vectors))
+
+    def begin_training(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Snapshot the indexed vectors for fit and start tracking changes
+
+        Returns:
+            The IDs and unit vectors to pass to fit
+        """
+        self._changed = set()
+        return self._contents()
+
+    def finish_training(self, trained: Tuple[np.ndarray, List[_VectorBlock], Dict[str, int], int]):
+        """
+        Install the result of fit on a begin_training snapshot
+
+        Vectors added, replaced or removed since the snapshot are moved
+        over from the current lists, so nothing written meanwhile is lost.
+        The result is dropped if the index was cleared or the training
+        aborted since begin_training.
+
+        Args:
+            trained: The value returned by fit
+        """
+        if self._changed is None:
+            return
+        changed, self._changed = self._changed, None
+        centroids, lists, where, trained_size = trained
+        current_ids, current_vectors = self.get_vectors(changed)
+        for memory_id in changed:
+            list_no = where.pop(memory_id, None)
+            if list_no is not None:
+                lists[list_no].remove(memory_id)
+        self._install(trained)
+        self.add(current_ids, current_vectors)
+
+    def abort_training(self):
+        """Stop tracking changes for a training run that will not finish"""
+        self._changed = None
+
+    def _contents(self) -> Tuple[List[str], np.ndarray]:
+        """Every indexed ID and a copy of its unit vector"""
+        ids = [memory_id for block in self._lists for memory_id in block.ids]
+        if not ids:
+            return [], np.empty((0, self.dimension), dtype=np.float32)
+        return ids, np.concatenate([block.vectors[:len(block)] for block in self._lists])
+
+    def fit(self, ids: List[str], vectors: np.ndarray
+           ) -> Tuple[np.ndarray, List[_VectorBlock], Dict[str, int], int]:
+        """
+        Cluster unit vectors and distribute them over new lists
+
+        The index itself is not modified, so this can run on another thread
+        while the index keeps serving.
+
+        Args:
+            ids: Memory IDs, one per vector
+            vectors: Unit vectors, as returned by begin_training
+
+        Returns:
+            The centroids, lists and list number per ID, and the number of
+            vectors trained on, for finish_training
+        """
+        n_lists = self.n_lists or int(np.sqrt(len(ids)))
+        n_lists = max(1, min(n_lists, len(ids)))
+
+        rng = np.random.default_rng(self.seed)
+        if len(ids) > self.max_train_samples:
+            sample = vectors[rng.choice(len(ids), self.max_train_samples, replace=False)]
+        else:
+            sample = vectors
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assignments = self._assign(sample, centroids)
+            sums = _cluster_sums(sample, assignments, n_lists)
+            empty = ~sums.any(axis=1)
+            # Re-seed empty clusters so no list is wasted
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        lists = [_VectorBlock(self.dimension) for _ in range(n_lists)]
+        where: Dict[str, int] = {}
+        assignments = self._assign(vectors, centroids)
+        for list_no in np.unique(assignments):
+            mask = assignments == list_no
+            list_ids = [memory_id for memory_id, keep in zip(ids, mask) if keep]
+            lists[list_no].add(list_ids, vectors[mask])
+            for memory_id in list_ids:
+                where[memory_id] = int(list_no)
+
+        logger.info(f"Trained IVF index with {n_lists} lists over {len(ids)} vectors")
+        return centroids, lists, where, len(ids)
+
+    def _install(self, trained: Tuple[np.ndarray, List[_VectorBlock], Dict[str, int], int]):
+        self._centroids, self._lists, self._where, self._trained_size = trained
+        self._size = len(self._where)
+
+    def _assign(self, unit_vectors: np.ndarray, centroids: np.ndarray = None,
+               chunk_size: int = 16384) -> np.ndarray:
+        """Assign each vector to its closest centroid, in bounded chunks"""
+        centroids = self._centroids if centroids is None else centroids
+        assignments = np.empty(len(unit_vectors), dtype=np.int64)
+        for start in range(0, len(unit_vectors), chunk_size):
+            chunk = unit_vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+def create_index(kind: str, dimension: int) -> Optional[VectorIndex]:
+    """
+    Create a vector index by name
+
+    Args:
+        kind: Index type ("ivf", "flat", or "none" to disable indexing)
+        dimension: Dimension of the indexed vectors
+
+    Returns:
+        The new index, or None when indexing is disabled
+    """
+    if kind in (None, "none"):
+        return None
+    if kind == "ivf":
+        return IVFFlatIndex(dimension)
+    if kind == "flat":
+        return FlatIndex(dimension)
+    raise ValueError(f"Unknown vector index type: {kind}")